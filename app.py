@@ -1,52 +1,33 @@
 import streamlit as st
-import requests
+import contextlib
+import hashlib
 import json
 import os
-import tempfile
-from pydub import AudioSegment
-from openai import OpenAI
-import docx
-import PyPDF2
-import unicodedata
-import re
-
-# --- Configuration & Constants ---
-OPENAI_API_KEY = os.getenv("GEMINI_API_KEY")
-MINIMAX_GROUP_ID = os.getenv("MINIMAX_GROUP_ID")
-MINIMAX_API_KEY = os.getenv("MINIMAX_API_KEY")
-
-VOICE_OPTIONS = {
-    "青涩青年音色": "male-qn-qingse", "精英青年音色": "male-qn-jingying", "霸道青年音色": "male-qn-badao",
-    "青年大学生音色": "male-qn-daxuesheng", "少女音色": "female-shaonv", "御姐音色": "female-yujie",
-    "成熟女性音色": "female-chengshu", "甜美女性音色": "female-tianmei", "男性主持人": "presenter_male",
-    "女性主持人": "presenter_female", "男性有声书1": "audiobook_male_1", "男性有声书2": "audiobook_male_2",
-    "女性有声书1": "audiobook_female_1", "女性有声书2": "audiobook_female_2",
-    "青涩青年音色-beta": "male-qn-qingse-jingpin", "精英青年音色-beta": "male-qn-jingying-jingpin",
-    "霸道青年音色-beta": "male-qn-badao-jingpin", "青年大学生音色-beta": "male-qn-daxuesheng-jingpin",
-    "少女音色-beta": "female-shaonv-jingpin", "御姐音色-beta": "female-yujie-jingpin",
-    "成熟女性音色-beta": "female-chengshu-jingpin", "甜美女性音色-beta": "female-tianmei-jingpin",
-    "聪明男童": "clever_boy", "可爱男童": "cute_boy", "萌萌女童": "lovely_girl", "卡通猪小琪": "cartoon_pig",
-    "病娇弟弟": "bingjiao_didi", "俊朗男友": "junlang_nanyou", "纯真学弟": "chunzhen_xuedi",
-    "冷淡学长": "lengdan_xiongzhang", "霸道少爷": "badao_shaoye", "甜心小玲": "tianxin_xiaoling",
-    "俏皮萌妹": "qiaopi_mengmei", "妩媚御姐": "wumei_yujie", "嗲嗲学妹": "diadia_xuemei",
-    "淡雅学姐": "danya_xuejie"
-}
-
-DIALOGUE_STYLES = {
-    "轻松幽默": "以轻松、幽默的方式进行对话，加入适当的笑话和轻松的语气。",
-    "专业深入": "以专业、深入的方式探讨主题，注重细节和逻辑分析。",
-    "生动叙事": "以故事化、形象化的方式叙述，增强听众的沉浸感。",
-    "激烈争辩": "以对立、争辩的风格展开对话，突出不同观点的碰撞。",
-    "温暖治愈": "用温柔、暖心的语言传递情感，注重共情与安抚，适合分享心事、给予鼓励的场景。",
-    "简洁干练": "语言直截了当、聚焦核心信息，适合快速沟通、传达指令或高效解决问题的场景。",
-    "文艺诗意": "运用优美修辞与意象化表达，营造浪漫或哲思氛围，适合文学交流、情感抒发的场景。",
-    "萌系软萌": "用俏皮可爱的语气和词汇，搭配撒娇或萌系表达，适合轻松娱乐、互动调侃的场景。",
-    "悬疑探秘": "用神秘悬疑的语调设置悬念，引导好奇，适合故事讲述、推理讨论或剧情分析的场景。",
-    "励志燃情": "充满激情与力量感，用短句、排比激发斗志，适合演讲、激励他人或自我打气的场景。",
-    "吐槽犀利": "用幽默讽刺、一针见血的语言点评现象，带点毒舌趣味，适合调侃热点、分享观点的场景。"
-}
-
-MINIMAX_API_URL_TEMPLATE = "https://api.minimax.chat/v1/t2a_v2?GroupId={group_id}"
+import time
+import uuid
+from pipeline import (
+    ARTIFACT_DIR, JOBS_DIR, VOICE_OPTIONS, DIALOGUE_STYLES, TTS_MAX_CONCURRENCY, SPECULATIVE_TTS_MAX_CHARS, DEFAULT_RECOMMENDATIONS, PodcastError,
+    get_artifact_store, get_job_queue, submit_episode_job, get_tts_cache, content_hash, estimate_tokens, compact_content, condense_content, extract_text_from_file,
+    recommend_characters_and_voices, generate_dialogue_openai, generate_dialogue_openai_stream,
+    synthesize_dialogue, concatenate_audio_files, is_valid_dialogue, dialogue_lines, episode_chapters, export_episode,
+)
+from episode_output import read_chapters
+from media_server import GrowingFile, media_url, start_media_server
+from mp3_concat import Mp3FormatError, append_mp3_frames
+from speculation import SpeculationBudget, SpeculativeSynthesis
+from telemetry import recent_spans, render_prometheus, start_metrics_server, summarize_spans
+
+# Expose Prometheus metrics for the whole server process when a port is configured
+if os.getenv("METRICS_PORT"):
+    start_metrics_server(int(os.getenv("METRICS_PORT")))
+
+# Serve episodes, and the live stream of one being generated, from disk when a port is configured;
+# MEDIA_BASE_URL is how browsers reach it
+MEDIA_ROOTS = (("artifacts", ARTIFACT_DIR), ("jobs", JOBS_DIR))
+MEDIA_BASE_URL = None
+if os.getenv("MEDIA_PORT"):
+    start_media_server(int(os.getenv("MEDIA_PORT")), MEDIA_ROOTS)
+    MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", f"http://localhost:{os.getenv('MEDIA_PORT')}")
 
 # --- Initialize Session State ---
 if 'extracted_content' not in st.session_state:
@@ -61,290 +42,306 @@ if 'edited_dialogue' not in st.session_state:
     st.session_state.edited_dialogue = None
 if 'character_recommendations' not in st.session_state:
     st.session_state.character_recommendations = None
+if 'synthesized_segments' not in st.session_state:
+    st.session_state.synthesized_segments = {}
+if 'active_job_id' not in st.session_state:
+    st.session_state.active_job_id = None
+if 'rerun_memo' not in st.session_state:
+    st.session_state.rerun_memo = {}
+if 'artifact_session_id' not in st.session_state:
+    st.session_state.artifact_session_id = uuid.uuid4().hex
+if 'audio_start_time' not in st.session_state:
+    st.session_state.audio_start_time = 0
+if 'speculation' not in st.session_state:
+    st.session_state.speculation = None
+if 'speculation_budget' not in st.session_state:
+    st.session_state.speculation_budget = SpeculationBudget(SPECULATIVE_TTS_MAX_CHARS)
+
+# Keep this session's working files from being cleaned up while it is in use
+get_artifact_store().session_dir(st.session_state.artifact_session_id)
 
 # --- Helper Functions ---
-def sanitize_filename(filename):
+def memoize_in_session(name, key, compute):
     """
-    Sanitize a filename to prevent encoding issues:
-    1. Normalize Unicode characters
-    2. Replace spaces with underscores
-    3. Remove characters that might cause issues
-    4. Ensure the filename has a valid extension
+    Return `compute()`, reusing the value from earlier reruns of this session while `key` is unchanged.
+
+    Streamlit re-executes the whole script on every widget interaction; derived state that
+    only depends on `key` (an upload's hash, the script text, ...) is recomputed only when
+    that input actually changes. One value is kept per `name`.
     """
-    # Normalize unicode characters
-    clean_name = unicodedata.normalize('NFKD', filename)
-    # Replace spaces and remove problematic characters
-    clean_name = re.sub(r'[^\w\s.-]', '', clean_name).replace(' ', '_')
-    
-    # Ensure we keep the original extension
-    original_ext = os.path.splitext(filename)[1].lower()
-    if original_ext in ['.txt', '.pdf', '.docx']:
-        # Make sure the extension is preserved correctly
-        base = os.path.splitext(clean_name)[0]
-        clean_name = f"{base}{original_ext}"
-        
-    return clean_name
+    memo = st.session_state.rerun_memo
+    if name not in memo or memo[name][0] != key:
+        memo[name] = (key, compute())
+    return memo[name][1]
 
-def extract_text_from_file(uploaded_file):
-    """Extract text from uploaded file (.txt, .pdf, .docx)."""
+def get_compaction():
+    """Return the CompactionResult for the extracted content, reusing the last result for the same content."""
+    content = st.session_state.extracted_content
+    return memoize_in_session("compaction", content_hash(content), lambda: compact_content(content))
+
+def get_prompt_content():
+    """Return the extracted content compacted and condensed to the prompt budget, reusing the last result for the same content."""
+    if not st.session_state.extracted_content:
+        return st.session_state.extracted_content
+    content = get_compaction().text
+
+    def condense():
+        with st.spinner(f"内容较长（约 {estimate_tokens(content)} tokens），正在分段提炼要点..."):
+            return condense_content(content)
+
+    return memoize_in_session("prompt_content", content_hash(content), condense)
+
+def extract_upload(uploaded_file):
+    """Extract the text of an uploaded file; returns (content, error message)."""
+    with st.spinner("正在从文件中提取文本..."):
+        progress_placeholder = st.empty()
+        try:
+            return extract_text_from_file(
+                uploaded_file.name,
+                uploaded_file.getvalue(),
+                on_progress=lambda extracted_chars: progress_placeholder.caption(f"已提取 {extracted_chars} 个字符...")
+            ), None
+        except PodcastError as e:
+            return None, str(e)
+        finally:
+            progress_placeholder.empty()
+
+def parse_edited_dialogue(edited_text):
+    """Parse and validate the edited script; returns (dialogue, error message)."""
     try:
-        # Sanitize the filename
-        original_filename = sanitize_filename(uploaded_file.name)
-        file_extension = os.path.splitext(original_filename)[1].lower()
-        
-        # Check if extension is supported
-        if file_extension not in ['.txt', '.pdf', '.docx']:
-            st.error("不支持的文件类型。请上传 .txt, .pdf 或 .docx 文件")
-            return None
-            
-        # Create a temporary file and save the uploaded content
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            temp_filepath = temp_file.name
-        
-        # Process the file based on its extension
-        if file_extension == '.txt':
-            with open(temp_filepath, 'r', encoding='utf-8') as f:
-                text = f.read()
-        elif file_extension == '.pdf':
-            text = ""
-            pdf_reader = PyPDF2.PdfReader(temp_filepath)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text() or ""
-                text += page_text
-        elif file_extension == '.docx':
-            doc = docx.Document(temp_filepath)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            
-        # Clean up the temporary file
-        os.unlink(temp_filepath)
-        
-        # Log extracted text for debugging
-        st.write(f"提取的文本 (前100字符): {text[:100]}...")
-        
-        # Check if text is empty or invalid
-        if not text.strip():
-            st.error("从文件中提取的文本为空或无效。")
-            return None
-            
-        return text
-    except Exception as e:
-        st.error(f"处理文件时出错：{e}")
-        return None
+        edited_dialogue = json.loads(edited_text)
+    except json.JSONDecodeError:
+        return None, "编辑的对话不是有效的 JSON 格式。请检查格式并重试。"
+    if not is_valid_dialogue(edited_dialogue):
+        return None, "编辑后的对话格式不正确。请确保为有效的 JSON 列表，每个对象包含 'speaker' 和 'line' 键。"
+    return edited_dialogue, None
 
-def generate_dialogue_openai(content, char1_name, char2_name, dialogue_style, model="gemini-2.0-flash"):
-    """Generate dialogue using OpenAI API."""
-    client = OpenAI(api_key=OPENAI_API_KEY, base_url="https://generativelanguage.googleapis.com/v1beta/")
-    style_instruction = DIALOGUE_STYLES[dialogue_style]
-    prompt = f"""
-    根据以下内容，为两个角色（{char1_name} 和 {char2_name}）生成一段引人入胜的播客对话。
-    对话应以{style_instruction}的方式，深入探讨内容的主题和信息，可以适当展开话题，以对话形式呈现,可适当增加一些口语，增加真实性。
-    基础分析结构
-    简明概述：以简单术语解释核心概念
-    重要案例研究：历史与现代应用实例
-    当前实践方法：科学有效性与方法论
-    未来影响：预测发展方向与应用可能
-    分析方法（费曼技巧）
-    将复杂概念简化为通俗易懂的解释
-    识别知识盲点并深入研究
-    通过类比和实例连接相关概念
-    为每个发现提供实际应用案例
-    设计引导思考的练习问题
-    建立清晰的心智模型
-    每个关键点用3句话总结
-    战略思维框架
-    预测分析：探究不同背景下的多种方法与基本假设
-    监控观察：识别模式并与最佳实践比较
-    选择应用：从熟悉案例过渡到创新框架
-    顺序安排：策略性地构建学习路径
-    联系整合：通过分解、测试和迭代，将表面差异与核心原则连接起来
-    文字里不要包含动作或者表情细节，因为播客是文字形式。最多15轮对话。
-    输出格式为 JSON 列表，每个对象包含 "speaker" 键（值为 "{char1_name}" 或 "{char2_name}"）和 "line" 键（角色所说的话）。
-    不要在 JSON 列表之外包含任何其他文本或说明。
-
-    内容：
-    ---
-    {content}
-    ---
-
-    JSON 输出：
+def generate_podcast_audio(lines, progressive_playback, assembly_options=None):
     """
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "你是一个富有创意的播客脚本作者。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
+    Synthesize and assemble a podcast while reporting progress in the page.
+
+    `lines` is an iterable of (line_number, speaker_name, line_text, voice_id) tuples. It may
+    be a generator that is still producing lines (e.g. from a streamed script); synthesis
+    starts on each line as soon as it is yielded. Lines whose text and voice are unchanged
+    since the session's last run reuse that run's segments instead of calling Minimax again.
+    `assembly_options` are passed to concatenate_audio_files.
+    Returns the final MP3 path, or None if no audio could be produced.
+    """
+    temp_dir = get_artifact_store().new_run_dir(st.session_state.artifact_session_id)
+    progress_bar = st.progress(0)
+    status_placeholder = st.empty()
+    status_placeholder.info(f"正在并发生成音频（最多同时 {TTS_MAX_CONCURRENCY} 个请求）...")
+
+    line_order = []
+    speakers_by_line = {}
+    previous_segments = st.session_state.synthesized_segments
+
+    def lines_to_synthesize():
+        for line_number, speaker_name, line_text, voice_id in lines:
+            line_order.append(line_number)
+            speakers_by_line[line_number] = (speaker_name, line_text)
+            yield line_number, line_text, voice_id
+
+    completed_lines = []
+    cache_stats_before = get_tts_cache().stats()
+
+    # Segments finish out of order; publish only the contiguous prefix so playback follows the dialogue
+    playlist_container = st.container() if progressive_playback else None
+    if playlist_container:
+        playlist_container.subheader("🎧 边生成边收听")
+    playlist_state = {"next": 0, "ready": {}, "format": None, "playing": False}
+    # With the media server running, published segments are appended to one live stream that a
+    # single player keeps playing; otherwise each segment gets its own player
+    live_stream = GrowingFile(os.path.join(temp_dir, "live.mp3")) if playlist_container and MEDIA_BASE_URL else None
+    now_playing = playlist_container.empty() if live_stream else None
+
+    def publish(line_number, audio_path):
+        speaker_name, line_text = speakers_by_line[line_number]
+        if not live_stream:
+            playlist_container.caption(f"{speaker_name}：{line_text[:30]}...")
+            playlist_container.audio(audio_path, format="audio/mp3", autoplay=playlist_state["next"] == 0)
+            return
+        try:
+            playlist_state["format"] = append_mp3_frames(audio_path, live_stream, playlist_state["format"])
+        except Mp3FormatError:
+            playlist_container.warning(f"该片段无法加入连续播放：{speaker_name}：{line_text[:30]}...")
+            return
+        if not playlist_state["playing"]:
+            playlist_container.audio(episode_file_url(live_stream.path), format="audio/mp3", autoplay=True)
+            playlist_state["playing"] = True
+        now_playing.caption(f"已生成至：{speaker_name}：{line_text[:30]}...")
+
+    def on_unit_done(line_numbers, audio_path, error):
+        completed_lines.extend(line_numbers)
+        progress_bar.progress(min(1.0, len(completed_lines) / len(line_order)))
+        if not playlist_container:
+            return
+        # Lines merged into one request play as part of the unit's first line
+        playlist_state["ready"][line_numbers[0]] = audio_path
+        for line_number in line_numbers[1:]:
+            playlist_state["ready"][line_number] = None
+        while playlist_state["next"] < len(line_order):
+            next_line_number = line_order[playlist_state["next"]]
+            if next_line_number not in playlist_state["ready"]:
+                break
+            ready_path = playlist_state["ready"].pop(next_line_number)
+            if ready_path:
+                publish(next_line_number, ready_path)
+            playlist_state["next"] += 1
+
+    with live_stream or contextlib.nullcontext():
+        synthesized, segments = synthesize_dialogue(
+            lines_to_synthesize(), temp_dir, on_unit_done=on_unit_done, reuse_segments=previous_segments
         )
-        dialogue_json_str = response.choices[0].message.content.strip()
-        
-        if dialogue_json_str.startswith("```json"):
-            dialogue_json_str = dialogue_json_str[7:]
-        if dialogue_json_str.endswith("```"):
-            dialogue_json_str = dialogue_json_str[:-3]
-        dialogue_json_str = dialogue_json_str.strip()
-
-        dialogue = json.loads(dialogue_json_str)
-        if not isinstance(dialogue, list) or not all(
-            isinstance(item, dict) and "speaker" in item and "line" in item for item in dialogue
-        ):
-            st.error(f"AI 返回的对话格式不正确。原始输出：{dialogue_json_str}")
-            return None
-        return dialogue
-    except json.JSONDecodeError:
-        st.error(f"无法解析 AI 响应为 JSON。原始输出：{dialogue_json_str}")
-        return None
-    except Exception as e:
-        st.error(f"使用 OpenAI 生成对话时出错：{e}")
+    status_placeholder.empty()
+    # Remember this run's segments so the next edit only re-synthesizes changed lines
+    st.session_state.synthesized_segments = segments
+    reused_segments = sum(1 for key in segments if key in previous_segments)
+    cache_stats = get_tts_cache().stats()
+    st.caption(
+        f"{len(line_order)} 行对话共合成 {len(segments)} 段语音，其中复用上次生成的 {reused_segments} 段；"
+        f"语音缓存：命中 {cache_stats['hits'] - cache_stats_before['hits']} 段，"
+        f"新合成 {cache_stats['misses'] - cache_stats_before['misses']} 段"
+    )
+
+    individual_audio_files = []
+    generation_errors = False
+    for line_numbers, audio_path, error in synthesized:
+        if audio_path:
+            individual_audio_files.append(audio_path)
+            continue
+        for line_number in line_numbers:
+            speaker_name, line_text = speakers_by_line[line_number]
+            st.error(f"无法为以下内容生成音频：{speaker_name} - \"{line_text}\"（{error}）")
+        generation_errors = True
+
+    if not individual_audio_files:
+        st.error("未成功生成任何音频片段，无法创建播客。")
         return None
+    if generation_errors:
+        st.warning("部分音频生成失败，将使用已生成的音频继续。")
 
-def recommend_characters_and_voices(content):
-    """Analyze content and recommend character names, voices, and dialogue style using OpenAI."""
-    client = OpenAI(api_key=OPENAI_API_KEY, base_url="https://generativelanguage.googleapis.com/v1beta/")
-    prompt = f"""
-    根据以下内容，推荐两个适合进行播客对话的角色名字（例如，名字应反映内容主题或角色背景），
-    每个角色的音色（从以下音色列表中选择：{', '.join(VOICE_OPTIONS.keys())}），
-    以及一个适合内容的对话风格（从以下风格中选择：{', '.join(DIALOGUE_STYLES.keys())}）。
-    输出 JSON 格式，包含两个角色，每个角色有 "name" 和 "voice" 键，以及一个 "dialogue_style" 键表示推荐的对话风格。
-    
-    内容：
-    ---
-    {content}
-    ---
-
-    JSON 输出：
-    {{
-        "characters": [
-            {{"name": "角色1名字", "voice": "音色名称"}},
-            {{"name": "角色2名字", "voice": "音色名称"}}
-        ],
-        "dialogue_style": "对话风格名称"
-    }}
-    """
+    final_podcast_path = os.path.join(temp_dir, "final_podcast.mp3")
     try:
-        response = client.chat.completions.create(
-            model="gemini-2.0-flash",
-            messages=[
-                {"role": "system", "content": "你是一个擅长分析文本并推荐播客角色和对话风格的 AI。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
+        concatenated_audio = concatenate_audio_files(
+            individual_audio_files, final_podcast_path, **(assembly_options or {})
         )
-        response_json_str = response.choices[0].message.content.strip()
-        
-        if response_json_str.startswith("```json"):
-            response_json_str = response_json_str[7:]
-        if response_json_str.endswith("```"):
-            response_json_str = response_json_str[:-3]
-        response_json_str = response_json_str.strip()
-
-        recommendations = json.loads(response_json_str)
-        if (
-            not isinstance(recommendations, dict) or
-            "characters" not in recommendations or
-            "dialogue_style" not in recommendations or
-            not isinstance(recommendations["characters"], list) or
-            len(recommendations["characters"]) != 2 or
-            not all(
-                isinstance(item, dict) and "name" in item and "voice" in item and item["voice"] in VOICE_OPTIONS
-                for item in recommendations["characters"]
-            ) or
-            recommendations["dialogue_style"] not in DIALOGUE_STYLES
-        ):
-            st.warning(f"AI 推荐的格式不正确，将使用默认值。原始输出：{response_json_str}")
-            return {
-                "characters": [
-                    {"name": "Alice", "voice": "少女音色"},
-                    {"name": "Bob", "voice": "青涩青年音色"}
-                ],
-                "dialogue_style": "轻松幽默"
-            }
-        return recommendations
-    except Exception as e:
-        st.warning(f"推荐角色和对话风格时出错，将使用默认值：{e}")
-        return {
-            "characters": [
-                {"name": "Alice", "voice": "少女音色"},
-                {"name": "Bob", "voice": "青涩青年音色"}
-            ],
-            "dialogue_style": "轻松幽默"
-        }
-
-def text_to_speech_minimax(text_to_speak, voice_id):
-    """Generate speech using Minimax API and return audio content."""
-    url = MINIMAX_API_URL_TEMPLATE.format(group_id=MINIMAX_GROUP_ID)
-    headers = {
-        "Authorization": f"Bearer {MINIMAX_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "speech-02-turbo",
-        "text": text_to_speak,
-        "timber_weights": [
-            {
-                "voice_id": voice_id,
-                "weight": 100
-            }
-        ],
-        "voice_setting": {
-            "voice_id": "",
-            "speed": 1.0,
-            "pitch": 0,
-            "vol": 1.0,
-            "latex_read": False
-        },
-        "audio_setting": {
-            "sample_rate": 32000,
-            "bitrate": 128000,
-            "format": "mp3"
-        },
-        "language_boost": "auto"
+        # chapters.json next to the episode gives the player one chapter per dialogue turn
+        export_episode(
+            concatenated_audio,
+            individual_audio_files,
+            episode_chapters(synthesized, speakers_by_line, assembly_options),
+            temp_dir,
+            formats=(),
+        )
+    except PodcastError as e:
+        st.error(str(e))
+        st.error("音频文件合并失败。")
+        return None
+    st.success("播客生成成功！")
+    return concatenated_audio
+
+def speculate(dialogue, characters):
+    """
+    Pre-synthesize the script in the background, restarting only when its lines or voices change.
+
+    The new run reuses every segment the superseded run finished, so an edit only pays for
+    the lines it touched; the session's speculation budget caps the rest.
+    """
+    lines = [
+        (line_number, line_text, voice_id)
+        for line_number, _, line_text, voice_id in dialogue_lines(dialogue, characters)
+    ]
+    key = content_hash(json.dumps(lines, ensure_ascii=False))
+    previous = st.session_state.speculation
+    if previous and previous.key == key:
+        return
+    if previous:
+        previous.cancel()
+    run_dir = get_artifact_store().new_run_dir(st.session_state.artifact_session_id)
+    reuse_segments = dict(st.session_state.synthesized_segments)
+
+    def synthesize(budgeted_lines):
+        if previous:
+            previous.wait()
+            reuse_segments.update(previous.segments())
+        return synthesize_dialogue(budgeted_lines, run_dir, reuse_segments=reuse_segments)[1]
+
+    st.session_state.speculation = SpeculativeSynthesis(
+        key, synthesize, lines, st.session_state.speculation_budget
+    )
+
+def take_speculative_segments():
+    """Stop speculating and hand the segments it finished to the next real run."""
+    speculation = st.session_state.speculation
+    if speculation is None:
+        return
+    # Requests already sent are paid for, so wait for them rather than sending them again
+    speculation.cancel()
+    speculation.wait()
+    st.session_state.synthesized_segments = {
+        **st.session_state.synthesized_segments, **speculation.segments()
     }
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        parsed_json = response.json()
-        
-        if 'data' not in parsed_json or 'audio' not in parsed_json['data']:
-            st.error(f"Minimax API 未返回音频数据。响应：{response.text}")
-            return None
-        
-        audio_hex = parsed_json['data']['audio']
-        try:
-            audio_content = bytes.fromhex(audio_hex)
-            return audio_content
-        except ValueError as ve:
-            st.error(f"无法将音频数据从十六进制解码：{ve}")
-            return None
-            
-    except requests.exceptions.RequestException as e:
-        st.error(f"调用 Minimax API 时出错：{e}")
-        return None
-    except json.JSONDecodeError as je:
-        st.error(f"无法解析 Minimax API 响应为 JSON：{response.text}")
-        return None
+@st.fragment(run_every=2)
+def show_speculation_status():
+    """Poll the background pre-synthesis; the final summary is shown by the next full run."""
+    speculation = st.session_state.speculation
+    if speculation.done:
+        st.rerun()
+    budget = st.session_state.speculation_budget
+    st.caption(
+        f"⚡ 正在预合成语音：已提交 {speculation.submitted_lines}/{speculation.total_lines} 行"
+        f"（本次会话已用额度 {budget.spent_chars}/{budget.max_chars} 字符）"
+    )
 
-def concatenate_audio_files(audio_files_paths, output_path):
-    """Concatenate multiple MP3 files into one."""
-    if not audio_files_paths:
-        return None
-    
-    combined = AudioSegment.empty()
+def episode_file_url(path):
+    """Return the media server URL of an episode file, or None when files go through Streamlit."""
+    return media_url(MEDIA_BASE_URL, dict(MEDIA_ROOTS), path) if MEDIA_BASE_URL else None
+
+def offer_download(path, label, file_name, mime):
+    """Offer a file for download, straight from disk when the media server is running."""
+    url = episode_file_url(path)
+    if url:
+        st.link_button(label, f"{url}?download={file_name}")
+        return
+    # Without the media server Streamlit reads the whole file into its in-memory media store
+    with open(path, "rb") as fp:
+        st.download_button(label=label, data=fp, file_name=file_name, mime=mime)
+
+def current_owner():
+    """Return who background jobs are scheduled for: the signed-in user, else this browser session."""
     try:
-        for file_path in audio_files_paths:
-            segment = AudioSegment.from_mp3(file_path)
-            combined += segment
-        combined.export(output_path, format="mp3")
-        return output_path
-    except Exception as e:
-        st.error(f"音频合并时出错：{e}")
-        st.error("请确保已安装 ffmpeg 并将其添加到系统 PATH 中。")
-        return None
+        email = st.user.get("email")
+    except Exception:
+        email = None
+    return email or st.session_state.artifact_session_id
+
+JOB_STAGE_LABELS = {
+    "condense": "提炼内容要点", "recommend": "推荐角色", "dialogue": "编写对话脚本",
+    "synthesize": "合成语音", "concatenate": "合并音频", "export": "导出音频格式",
+}
+
+@st.fragment(run_every=2)
+def show_job_status(job_id):
+    """Poll a background job without blocking the page; the finished episode is shown by the next full run."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.session_state.active_job_id = None
+        st.warning("后台任务已不存在。")
+        return
+    if job["status"] == "queued":
+        st.info(f"⏳ 后台任务排队中，前面还有 {get_job_queue().queue_position(job_id)} 个任务。")
+    elif job["status"] == "running":
+        st.info(f"⚙️ 后台任务进行中：{JOB_STAGE_LABELS.get(job['stage'], job['stage'] or '准备中')}...")
+    else:
+        st.session_state.active_job_id = None
+        if job["status"] == "done":
+            st.session_state.final_audio_path = job["result"]["episode"]
+            st.session_state.audio_start_time = 0
+        else:
+            st.session_state.job_error = job["error"]
+        st.rerun()
 
 # --- Streamlit App UI ---
 st.set_page_config(layout="wide", page_title="AI 播客生成器")
@@ -358,6 +355,11 @@ with st.sidebar:
     uploaded_file = st.file_uploader("上传内容（txt, pdf, docx）", type=["txt", "pdf", "docx"])
     st.caption("提示：如果上传包含中文或特殊字符的文件名时遇到错误，请尝试将文件名修改为仅包含英文字母和数字，然后重新上传。")
     raw_text_input = st.text_area("或在此粘贴文本内容", height=150)
+    force_regenerate = st.checkbox(
+        "强制重新生成（忽略缓存）",
+        value=False,
+        help="默认情况下，相同内容、模型和参数的 AI 结果会直接从缓存返回。"
+    )
 
     st.divider()
 
@@ -365,24 +367,30 @@ with st.sidebar:
 
     if st.session_state.extracted_content and not st.session_state.character_recommendations:
         with st.spinner("正在分析内容并推荐角色和对话风格..."):
-            st.session_state.character_recommendations = recommend_characters_and_voices(st.session_state.extracted_content)
+            try:
+                st.session_state.character_recommendations = recommend_characters_and_voices(
+                    get_prompt_content(), force_refresh=force_regenerate
+                )
+            except PodcastError as e:
+                st.warning(f"{e} 将使用默认值。")
+                st.session_state.character_recommendations = DEFAULT_RECOMMENDATIONS
     elif not st.session_state.extracted_content:
         st.info("请先上传文件或输入文本内容以生成角色和对话风格推荐。")
 
     default_char1 = (
         st.session_state.character_recommendations["characters"][0]
         if st.session_state.character_recommendations
-        else {"name": "Alice", "voice": "少女音色"}
+        else DEFAULT_RECOMMENDATIONS["characters"][0]
     )
     default_char2 = (
         st.session_state.character_recommendations["characters"][1]
         if st.session_state.character_recommendations
-        else {"name": "Bob", "voice": "青涩青年音色"}
+        else DEFAULT_RECOMMENDATIONS["characters"][1]
     )
     default_dialogue_style = (
         st.session_state.character_recommendations["dialogue_style"]
         if st.session_state.character_recommendations
-        else "轻松幽默"
+        else DEFAULT_RECOMMENDATIONS["dialogue_style"]
     )
 
     st.write(f"**角色 1（推荐：{default_char1['name']}, 音色：{default_char1['voice']}）**")
@@ -404,6 +412,10 @@ with st.sidebar:
         key="char2_voice"
     )
     char2_voice_id = VOICE_OPTIONS[char2_voice_name]
+    characters = [
+        {"name": char1_name, "voice": char1_voice_name},
+        {"name": char2_name, "voice": char2_voice_name}
+    ]
 
     st.subheader("💬 对话风格")
     st.write(f"**推荐对话风格：{default_dialogue_style}**")
@@ -414,24 +426,69 @@ with st.sidebar:
         key="dialogue_style"
     )
     
+    st.subheader("🎚️ 音频后期")
+    gap_seconds = st.slider("轮次间停顿（秒）", 0.0, 1.5, 0.0, 0.1)
+    crossfade_seconds = st.slider(
+        "轮次间交叉淡化（秒）", 0.0, 0.5, 0.0, 0.05,
+        disabled=gap_seconds > 0, help="仅在没有停顿时生效。"
+    )
+    normalize_loudness = st.checkbox("统一各角色音量", value=False, help="将每段语音调整到相同的响度（-20 dBFS）。")
+    assembly_options = {
+        "gap_seconds": gap_seconds,
+        "crossfade_seconds": crossfade_seconds,
+        "target_dbfs": -20.0 if normalize_loudness else None,
+    }
+
     st.divider()
+    pipeline_tts = st.checkbox(
+        "流式生成脚本并同步合成语音",
+        value=False,
+        help="边生成对话脚本边合成语音，脚本完成后即可得到播客。"
+    )
+    speculative_tts = st.checkbox(
+        "脚本生成后立即预合成语音",
+        value=False,
+        help=f"阅读和修改脚本时就在后台合成语音，脚本不变时点击生成几乎立即完成；"
+             f"修改过的行会重新合成。每次会话最多预合成 {SPECULATIVE_TTS_MAX_CHARS} 字符。"
+    )
     generate_dialogue_button = st.button("📝 生成对话脚本", type="primary", use_container_width=True)
 
+    st.divider()
+    show_profiling = st.checkbox(
+        "显示性能分析",
+        value=os.getenv("SHOW_PROFILING", "0") == "1",
+        help="按阶段统计提取、推荐、对话生成、语音合成和音频合并的耗时、重试与缓存命中。"
+    )
+
 # --- Main Area for Output ---
 # 1. Display extracted content if file uploaded
 if uploaded_file:
-    with st.spinner("正在从文件中提取文本..."):
-        content = extract_text_from_file(uploaded_file)
-        if content:
-            st.session_state.extracted_content = content
-            st.subheader("📄 提取的内容")
-            st.text_area("提取的文本", content, height=200, disabled=True)
-        else:
-            st.error("无法从上传的文件中提取内容。")
-            st.stop()
+    # Only a different upload is extracted again; other widget interactions reuse the text
+    upload_key = (uploaded_file.name, hashlib.sha256(uploaded_file.getvalue()).hexdigest())
+    content, extraction_error = memoize_in_session("extraction", upload_key, lambda: extract_upload(uploaded_file))
+    if content:
+        # Log extracted text for debugging
+        st.write(f"提取的文本 (前100字符): {content[:100]}...")
+        st.session_state.extracted_content = content
+        st.subheader("📄 提取的内容")
+        # Show the text as it will be sent to the model, without page headers and footers
+        st.text_area("提取的文本", get_compaction().text, height=200, disabled=True)
+    else:
+        st.error(extraction_error)
+        st.error("无法从上传的文件中提取内容。")
+        st.stop()
 elif raw_text_input:
     st.session_state.extracted_content = raw_text_input
 
+if st.session_state.extracted_content:
+    compaction = get_compaction()
+    if compaction.chars_after < compaction.chars_before:
+        st.caption(
+            f"🧹 已去除页眉页脚、断行和多余空白：{compaction.chars_before} → {compaction.chars_after} 字符，"
+            f"约节省 {compaction.tokens_before - compaction.tokens_after} tokens"
+            f"（{1 - compaction.tokens_after / compaction.tokens_before:.0%}）"
+        )
+
 # 2. Generate dialogue
 if generate_dialogue_button:
     st.session_state.dialogue_script = None
@@ -439,14 +496,56 @@ if generate_dialogue_button:
     st.session_state.json_script_data = None
     st.session_state.edited_dialogue = None
 
-    content = st.session_state.extracted_content
+    content = get_prompt_content()
     if not content:
         st.warning("请上传文件或粘贴文本内容。")
         st.stop()
 
-    with st.spinner(f"AI 正在为 {char1_name} 和 {char2_name} 编写对话...（这可能需要一些时间）"):
-        dialogue = generate_dialogue_openai(content, char1_name, char2_name, dialogue_style)
-    
+    if pipeline_tts:
+        st.subheader("💬 正在生成的对话脚本")
+        script_placeholder = st.empty()
+        dialogue = []
+
+        def lines_from_stream():
+            # A stream error propagates through synthesis, so a truncated script is never assembled
+            for turn in generate_dialogue_openai_stream(
+                content, char1_name, char2_name, dialogue_style, force_refresh=force_regenerate
+            ):
+                dialogue.append(turn)
+                script_placeholder.json(dialogue)
+                speaker_name = turn.get("speaker")
+                line_text = turn.get("line")
+                if not speaker_name or not line_text:
+                    st.warning(f"跳过无效对话片段：{turn}")
+                    continue
+                voice_id_to_use = char1_voice_id if speaker_name == char1_name else char2_voice_id
+                yield len(dialogue), speaker_name, line_text, voice_id_to_use
+
+        with st.spinner(f"AI 正在为 {char1_name} 和 {char2_name} 编写对话并同步合成语音..."):
+            try:
+                final_podcast_path = generate_podcast_audio(
+                    lines_from_stream(), progressive_playback=True, assembly_options=assembly_options
+                )
+            except PodcastError as e:
+                # Nothing is kept: neither the partial script nor an episode missing its ending
+                script_placeholder.empty()
+                st.error(f"对话生成在第 {len(dialogue) + 1} 段中断：{e}")
+                st.error("未完成的脚本和音频不会被保存，请重新生成。已合成的语音已缓存，重试时无需再次合成。")
+                st.stop()
+        script_placeholder.empty()
+        if final_podcast_path:
+            st.session_state.final_audio_path = final_podcast_path
+            st.session_state.audio_start_time = 0
+    else:
+        with st.spinner(f"AI 正在为 {char1_name} 和 {char2_name} 编写对话...（这可能需要一些时间）"):
+            try:
+                dialogue = generate_dialogue_openai(
+                    content, char1_name, char2_name, dialogue_style, force_refresh=force_regenerate
+                )
+            except PodcastError as e:
+                st.error(str(e))
+                dialogue = None
+
     if not dialogue:
         st.error("生成对话失败。")
         st.stop()
@@ -464,96 +563,167 @@ if st.session_state.dialogue_script:
         height=400
     )
     
-    try:
-        edited_dialogue = json.loads(edited_text)
-        if not isinstance(edited_dialogue, list) or not all(
-            isinstance(item, dict) and "speaker" in item and "line" in item for item in edited_dialogue
-        ):
-            st.error("编辑后的对话格式不正确。请确保为有效的 JSON 列表，每个对象包含 'speaker' 和 'line' 键。")
-        else:
+    edited_dialogue, script_error = memoize_in_session(
+        "edited_dialogue", edited_text, lambda: parse_edited_dialogue(edited_text)
+    )
+    if script_error:
+        st.error(script_error)
+    else:
+        if edited_text != st.session_state.edited_dialogue:
             st.session_state.edited_dialogue = edited_text
             st.session_state.json_script_data = edited_text.encode('utf-8')
-            
-            st.download_button(
-                label="📥 下载对话脚本 (JSON)",
-                data=st.session_state.json_script_data,
-                file_name="podcast_script.json",
-                mime="application/json"
+
+        st.download_button(
+            label="📥 下载对话脚本 (JSON)",
+            data=st.session_state.json_script_data,
+            file_name="podcast_script.json",
+            mime="application/json"
+        )
+        
+        progressive_playback = st.checkbox(
+            "边生成边播放",
+            value=True,
+            help="按对话顺序发布已合成的片段，无需等待全部语音生成完毕即可开始收听。"
+        )
+        run_in_background = st.checkbox(
+            "在后台队列中生成",
+            value=False,
+            help="任务在服务器上排队执行，关闭页面也不会中断；多人同时使用时按用户轮流处理。"
+        )
+
+        if speculative_tts and not st.session_state.active_job_id:
+            speculate(edited_dialogue, characters)
+        elif st.session_state.speculation:
+            st.session_state.speculation.cancel()
+        speculation = st.session_state.speculation
+        if speculation and not speculation.done:
+            show_speculation_status()
+        elif speculation and speculation.submitted_lines:
+            st.caption(
+                f"⚡ 已预合成 {speculation.submitted_lines}/{speculation.total_lines} 行语音"
+                + ("（已达本次会话的预合成额度）" if speculation.exhausted_budget else "")
             )
+
+        if st.button("🚀 生成播客", type="primary", disabled=bool(st.session_state.active_job_id)):
+            st.session_state.final_audio_path = None
             
-            if st.button("🚀 生成播客", type="primary"):
-                st.session_state.final_audio_path = None
-                
-                dialogue = edited_dialogue
-                individual_audio_files = []
-                temp_dir = tempfile.mkdtemp()
-
-                generation_errors = False
+            dialogue = edited_dialogue
+            for turn in dialogue:
+                if not turn.get("speaker") or not turn.get("line"):
+                    st.warning(f"跳过无效对话片段：{turn}")
+
+            if run_in_background:
+                # The job reads speculative segments from the shared TTS cache, so let requests
+                # still in flight land there instead of paying for them twice
+                with st.spinner("正在等待预合成的语音完成..."):
+                    take_speculative_segments()
+                st.session_state.active_job_id = submit_episode_job(
+                    current_owner(),
+                    st.session_state.extracted_content or "",
+                    characters=characters,
+                    dialogue_style=dialogue_style,
+                    dialogue=dialogue,
+                    assembly_options=assembly_options,
+                )
+            else:
                 with st.spinner("正在将对话转换为语音并组装播客..."):
-                    progress_bar = st.progress(0)
-                    total_lines = len(dialogue)
-
-                    for i, turn in enumerate(dialogue):
-                        speaker_name = turn.get("speaker")
-                        line_text = turn.get("line")
-
-                        if not speaker_name or not line_text:
-                            st.warning(f"跳过无效对话片段：{turn}")
-                            continue
-
-                        voice_id_to_use = char1_voice_id if speaker_name == char1_name else char2_voice_id
-                        
-                        status_placeholder = st.empty()
-                        status_placeholder.info(f"正在为 {speaker_name} 生成音频：\"{line_text[:30]}...\"")
-                        
-                        audio_content = text_to_speech_minimax(line_text, voice_id_to_use)
-                        
-                        if audio_content:
-                            temp_audio_path = os.path.join(temp_dir, f"line_{i+1}.mp3")
-                            with open(temp_audio_path, "wb") as f:
-                                f.write(audio_content)
-                            individual_audio_files.append(temp_audio_path)
-                        else:
-                            st.error(f"无法为以下内容生成音频：{speaker_name} - \"{line_text}\"")
-                            generation_errors = True
-                        
-                        progress_bar.progress((i + 1) / total_lines)
-                        status_placeholder.empty()
-
-                    if generation_errors and not individual_audio_files:
-                        st.error("未生成任何音频文件，无法创建播客。")
-                        st.stop()
-                    elif generation_errors:
-                        st.warning("部分音频生成失败，将使用已生成的音频继续。")
-
-                    if individual_audio_files:
-                        final_podcast_path = os.path.join(temp_dir, "final_podcast.mp3")
-                        concatenated_audio = concatenate_audio_files(individual_audio_files, final_podcast_path)
-                        if concatenated_audio:
-                            st.session_state.final_audio_path = concatenated_audio
-                            st.success("播客生成成功！")
-                        else:
-                            st.error("音频文件合并失败。")
-                    else:
-                        st.error("未成功生成任何音频片段，无法创建播客。")
-    except json.JSONDecodeError:
-        st.error("编辑的对话不是有效的 JSON 格式。请检查格式并重试。")
+                    take_speculative_segments()
+                    final_podcast_path = generate_podcast_audio(
+                        dialogue_lines(dialogue, characters), progressive_playback, assembly_options
+                    )
+                if final_podcast_path:
+                    st.session_state.final_audio_path = final_podcast_path
+                    st.session_state.audio_start_time = 0
+
+# Background job progress and history
+if st.session_state.active_job_id:
+    show_job_status(st.session_state.active_job_id)
+if st.session_state.get("job_error"):
+    st.error(f"后台任务失败：{st.session_state.pop('job_error')}")
+recent_jobs = get_job_queue().list_jobs(current_owner(), limit=10)
+if recent_jobs:
+    with st.expander("🗂️ 我的后台任务"):
+        for job in recent_jobs:
+            submitted = time.strftime("%m-%d %H:%M", time.localtime(job["created_at"]))
+            columns = st.columns([3, 1])
+            columns[0].write(f"{submitted} · {job['status']}" + (f" · {job['error']}" if job["error"] else ""))
+            if job["status"] == "done" and columns[1].button("收听", key=f"job_{job['id']}"):
+                st.session_state.final_audio_path = job["result"]["episode"]
+                st.session_state.audio_start_time = 0
 
 # 4. Display final podcast
 if st.session_state.final_audio_path:
     st.subheader("🎧 收听播客")
     try:
-        with open(st.session_state.final_audio_path, "rb") as ap:
-            st.audio(ap.read(), format="audio/mp3")
-        
-        with open(st.session_state.final_audio_path, "rb") as fp:
-            st.download_button(
-                label="📥 下载播客 (MP3)",
-                data=fp,
-                file_name="generated_podcast.mp3",
-                mime="audio/mpeg"
-            )
+        if not os.path.exists(st.session_state.final_audio_path):
+            raise FileNotFoundError(st.session_state.final_audio_path)
+        # A media server URL streams from disk; a path is copied into Streamlit's in-memory media store
+        st.audio(
+            episode_file_url(st.session_state.final_audio_path) or st.session_state.final_audio_path,
+            format="audio/mp3",
+            start_time=st.session_state.audio_start_time,
+        )
+
+        episode_dir = os.path.dirname(st.session_state.final_audio_path)
+        chapters = read_chapters(episode_dir)
+        if chapters:
+            with st.expander(f"📑 章节（{len(chapters)} 段对话）"):
+                for index, chapter in enumerate(chapters):
+                    minutes, seconds = divmod(int(chapter.start), 60)
+                    if st.button(f"{minutes:02d}:{seconds:02d}  {chapter.title}", key=f"chapter_{index}"):
+                        st.session_state.audio_start_time = int(chapter.start)
+                        st.rerun()
+                offer_download(
+                    os.path.join(episode_dir, "chapters.json"), "📥 下载章节 (JSON)",
+                    "chapters.json", "application/json+chapters"
+                )
+
+        offer_download(
+            st.session_state.final_audio_path, "📥 下载播客 (MP3)", "generated_podcast.mp3", "audio/mpeg"
+        )
+
+        opus_path = os.path.splitext(st.session_state.final_audio_path)[0] + ".opus"
+        if not os.path.exists(opus_path) and st.button("🗜️ 导出 Opus（体积更小，含章节）"):
+            with st.spinner("正在编码 Opus..."):
+                try:
+                    export_episode(
+                        st.session_state.final_audio_path, [], chapters, episode_dir, formats=("opus",)
+                    )
+                except PodcastError as e:
+                    st.error(str(e))
+        if os.path.exists(opus_path):
+            offer_download(opus_path, "📥 下载播客 (Opus)", "generated_podcast.opus", "audio/ogg")
     except FileNotFoundError:
-        st.error("未找到最终音频文件。生成或清理过程中可能出现问题。")
+        st.session_state.final_audio_path = None
+        st.error("未找到最终音频文件，可能已因长时间未使用被清理。请重新生成播客。")
     except Exception as e:
         st.error(f"显示或下载音频时出错：{e}")
+
+# 5. Profiling panel
+if show_profiling:
+    with st.expander("⏱️ 性能分析", expanded=True):
+        spans = recent_spans()
+        if not spans:
+            st.info("暂无记录。生成内容后这里会显示各阶段的耗时。")
+        else:
+            st.write("**各阶段统计（本服务进程内最近的调用）**")
+            st.dataframe(summarize_spans(spans), use_container_width=True)
+            st.write("**最近的调用**")
+            st.dataframe(
+                [
+                    {
+                        "stage": record["name"],
+                        "duration_s": round(record["duration"], 3),
+                        "status": record["status"],
+                        **record["attributes"],
+                    }
+                    for record in reversed(spans[-50:])
+                ],
+                use_container_width=True
+            )
+        st.download_button(
+            label="📥 下载指标 (Prometheus)",
+            data=render_prometheus(),
+            file_name="podcast_metrics.prom",
+            mime="text/plain"
+        )
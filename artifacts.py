@@ -0,0 +1,139 @@
+"""On-disk working files for app sessions: per-session namespaces with quotas and garbage collection."""
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_LAST_ACCESS_MARKER = ".last_access"
+
+
+def _disk_usage(*paths):
+    """Bytes used by the files under `paths`, counting hard links to the same file once."""
+    total = 0
+    seen = set()
+    for path in paths:
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                # Runs hard-link the segments they reuse from earlier runs
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    total += stat.st_size
+    return total
+
+
+class ArtifactStore:
+    """
+    Directory tree holding every session's generated files, e.g. segments and episodes.
+
+    Each session gets its own folder under `root` with one subfolder per run. Starting a
+    run deletes the session's oldest runs until it is back under `session_quota_bytes`.
+    `collect_garbage()` removes sessions idle for longer than `max_age_seconds` and then
+    the least recently used ones until the whole store fits in `max_bytes`; it is safe
+    to call from a background thread while sessions keep working, although a session
+    evicted for size while active loses its earlier runs.
+    """
+
+    def __init__(self, root, max_bytes, session_quota_bytes, max_age_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.session_quota_bytes = session_quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def session_dir(self, session_id):
+        """Return the session's folder, creating it and marking the session as active."""
+        path = os.path.join(self.root, session_id)
+        os.makedirs(path, exist_ok=True)
+        marker = os.path.join(path, _LAST_ACCESS_MARKER)
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+        return path
+
+    def _runs(self, session_path):
+        """Return (mtime, path) of the session's run folders, oldest first."""
+        runs = []
+        for name in os.listdir(session_path):
+            path = os.path.join(session_path, name)
+            if os.path.isdir(path):
+                runs.append((os.path.getmtime(path), path))
+        return sorted(runs)
+
+    def new_run_dir(self, session_id):
+        """Create a fresh folder for one generation run, making room under the session quota first."""
+        session_path = self.session_dir(session_id)
+        with self._lock:
+            runs = [path for _, path in self._runs(session_path)]
+            # Deleting a run only frees the files no later run links to, so measure again each time
+            while runs and _disk_usage(*runs) > self.session_quota_bytes:
+                shutil.rmtree(runs.pop(0), ignore_errors=True)
+        path = os.path.join(session_path, f"run-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(path)
+        return path
+
+    def _sessions(self):
+        """Return (last_access, path) for every session folder, least recently used first."""
+        sessions = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            marker = os.path.join(path, _LAST_ACCESS_MARKER)
+            try:
+                sessions.append((os.path.getmtime(marker if os.path.exists(marker) else path), path))
+            except FileNotFoundError:
+                continue
+        return sorted(sessions)
+
+    def collect_garbage(self):
+        """Delete expired sessions, then evict idle ones until under the size cap; returns bytes freed."""
+        freed = 0
+        now = time.time()
+        with self._lock:
+            sessions = []
+            for last_access, path in self._sessions():
+                size = _disk_usage(path)
+                if now - last_access > self.max_age_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    freed += size
+                else:
+                    sessions.append((last_access, path, size))
+
+            total = sum(size for _, _, size in sessions)
+            for _, path, size in sessions:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                freed += size
+        if freed:
+            logger.info("Artifact store cleanup freed %d bytes", freed)
+        return freed
+
+    def start_background_gc(self, interval_seconds):
+        """Run collect_garbage every `interval_seconds` in a daemon thread."""
+        def loop():
+            while True:
+                try:
+                    self.collect_garbage()
+                except OSError as e:
+                    logger.warning("Artifact store cleanup failed: %s", e)
+                time.sleep(interval_seconds)
+
+        threading.Thread(target=loop, daemon=True, name="artifact-gc").start()
+
+    def stats(self):
+        sessions = self._sessions()
+        return {
+            "sessions": len(sessions),
+            "bytes": sum(_disk_usage(path) for _, path in sessions),
+        }
@@ -0,0 +1,144 @@
+"""
+Single-buffer episode assembly with pauses, crossfades and loudness levelling.
+
+Segments are decoded one at a time with ffmpeg straight into one preallocated 16-bit
+buffer; gain, crossfades and silence are applied with NumPy on that buffer, and the
+result is encoded to MP3 in a single ffmpeg pass. Memory is the finished episode's PCM
+plus one segment, and the work is linear in the episode length.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from mp3_concat import mp3_duration
+
+# Silence (and near-silence) is left alone instead of being amplified towards the target
+_MIN_LEVELLED_RMS = 1e-4
+_ENCODE_CHUNK_SAMPLES = 1 << 20
+
+
+class AudioAssemblyError(RuntimeError):
+    """Raised when segments cannot be decoded, assembled or encoded."""
+
+
+def find_ffmpeg(error_class=AudioAssemblyError):
+    """Return the path of the ffmpeg executable, raising `error_class` when it is not installed."""
+    path = shutil.which("ffmpeg")
+    if not path:
+        raise error_class("未找到 ffmpeg，请安装 ffmpeg 并将其添加到系统 PATH 中")
+    return path
+
+
+def estimate_samples(path, sample_rate):
+    """Estimate the decoded length of an MP3 file in samples at `sample_rate`, from its frame headers."""
+    return int(mp3_duration(path) * sample_rate)
+
+
+def decode_segment(path, sample_rate):
+    """Decode an audio file to mono 16-bit PCM at `sample_rate`."""
+    result = subprocess.run(
+        [find_ffmpeg(), "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise AudioAssemblyError(f"无法解码 {path}：{result.stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def _rms(samples):
+    """Root mean square of int16 samples on a 0..1 scale, computed in float64 to avoid overflow."""
+    if not len(samples):
+        return 0.0
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) / 32768
+
+
+def assemble_segments(
+    audio_files_paths,
+    output_path,
+    sample_rate=32000,
+    gap_seconds=0.0,
+    crossfade_seconds=0.0,
+    target_dbfs=None,
+    bitrate="128k",
+):
+    """
+    Join audio segments into one MP3 at `output_path`.
+
+    `gap_seconds` of silence is inserted between turns. When there is no gap,
+    `crossfade_seconds` overlaps consecutive turns with a linear crossfade. With
+    `target_dbfs`, every segment is scaled to that RMS level (e.g. -20), so voices from
+    different speakers come out equally loud; peaks are clipped to full scale.
+    Returns `output_path`.
+    """
+    if not audio_files_paths:
+        raise AudioAssemblyError("没有可合并的音频片段")
+    gap = int(gap_seconds * sample_rate)
+    crossfade = 0 if gap else int(crossfade_seconds * sample_rate)
+
+    # Frame headers give the decoded length closely enough to allocate once; the slack
+    # covers decoder padding, and the buffer only grows if an estimate was badly off
+    capacity = sum(estimate_samples(path, sample_rate) + sample_rate // 10 for path in audio_files_paths)
+    capacity += gap * (len(audio_files_paths) - 1)
+    buffer = np.zeros(capacity, dtype=np.int16)
+    position = 0
+
+    for index, path in enumerate(audio_files_paths):
+        segment = decode_segment(path, sample_rate)
+        if target_dbfs is not None:
+            level = _rms(segment)
+            if level > _MIN_LEVELLED_RMS:
+                gain = 10 ** (target_dbfs / 20) / level
+                segment = np.clip(segment * gain, -32768, 32767).astype(np.int16)
+
+        overlap = min(crossfade, len(segment), position) if index else 0
+        start = position - overlap
+        end = start + len(segment)
+        if end + gap > len(buffer):
+            buffer = np.concatenate([buffer, np.zeros(end + gap - len(buffer) + sample_rate, dtype=np.int16)])
+
+        if overlap:
+            fade_in = np.linspace(0.0, 1.0, overlap, endpoint=False, dtype=np.float32)
+            mixed = buffer[start:position] * (1.0 - fade_in) + segment[:overlap] * fade_in
+            buffer[start:position] = np.clip(mixed, -32768, 32767)
+            buffer[position:end] = segment[overlap:]
+        else:
+            buffer[start:end] = segment
+        position = end
+        if index < len(audio_files_paths) - 1:
+            # The buffer is zero-initialised, so a gap is just skipping ahead
+            position += gap
+
+    _encode_mp3(buffer[:position], output_path, sample_rate, bitrate)
+    return output_path
+
+
+def _encode_mp3(samples, output_path, sample_rate, bitrate):
+    """Encode mono 16-bit PCM to MP3 with one ffmpeg process, writing through a temporary file."""
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix=".mp3.tmp")
+    os.close(fd)
+    try:
+        process = subprocess.Popen(
+            [
+                find_ffmpeg(), "-v", "error", "-y", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+                "-codec:a", "libmp3lame", "-b:a", bitrate, "-f", "mp3", temp_path,
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            for start in range(0, len(samples), _ENCODE_CHUNK_SAMPLES):
+                process.stdin.write(samples[start:start + _ENCODE_CHUNK_SAMPLES].tobytes())
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise AudioAssemblyError(f"音频编码失败：{stderr.decode('utf-8', 'replace').strip()}")
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
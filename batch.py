@@ -0,0 +1,192 @@
+"""
+Render podcast episodes for many documents without the Streamlit UI.
+
+Usage:
+    python batch.py INPUT [-o OUTPUT_DIR] [--workers N] [--force] [--formats hls,opus]
+
+INPUT is either a directory of .txt/.pdf/.docx files or a manifest (.json list or .jsonl)
+of entries like {"path": "report.pdf", "characters": [{"name": ..., "voice": ...}, ...],
+"dialogue_style": "专业深入", "assembly_options": {"gap_seconds": 0.3}}; characters and
+style default to the AI recommendation, and assembly_options (see concatenate_audio_files)
+to a plain concatenation. Each document gets its own folder under OUTPUT_DIR holding the
+extracted text, script, segments, episode.mp3 and chapters.json/chapters.vtt (one chapter per
+dialogue turn), plus status.json; --formats adds an HLS stream for static hosting
+(hls/playlist.m3u8) and/or a compact episode.opus with embedded chapters. Re-running the same
+command skips finished documents and resumes unfinished ones from their last completed stage.
+Per-stage timings, retries and cache hits for the run are written to OUTPUT_DIR/metrics.prom
+(set TELEMETRY_TRACE_FILE for a span-by-span JSONL trace).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pipeline import (
+    DIALOGUE_STYLES, SUPPORTED_EXTENSIONS, PodcastError, VOICE_OPTIONS, extract_text_from_file, generate_episode, sanitize_filename,
+)
+from telemetry import render_prometheus
+
+logger = logging.getLogger("batch")
+
+
+def load_jobs(input_path):
+    """Return the list of manifest entries for a directory or manifest file."""
+    if os.path.isdir(input_path):
+        jobs = [
+            {"path": os.path.join(input_path, name)}
+            for name in sorted(os.listdir(input_path))
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+        ]
+    else:
+        jobs = _read_manifest(input_path)
+
+    # Folders are named after the file, so two entries must not map to the same one
+    seen = {}
+    for job in jobs:
+        validate_job(job)
+        name = job_output_dir("", job)
+        if name in seen:
+            raise ValueError(f"{job['path']} and {seen[name]} would share the output folder {name!r}; set \"name\"")
+        seen[name] = job["path"]
+    return jobs
+
+
+def validate_job(job):
+    """Raise ValueError for a manifest entry that would only fail once its document is processed."""
+    if not isinstance(job.get("path"), str):
+        raise ValueError(f"Manifest entry without a \"path\": {job}")
+    characters = job.get("characters")
+    if characters is not None:
+        if not isinstance(characters, list) or len(characters) != 2 or not all(
+            isinstance(character, dict) and character.get("name") for character in characters
+        ):
+            raise ValueError(f"{job['path']}: \"characters\" must list two {{\"name\", \"voice\"}} objects")
+        for character in characters:
+            if character.get("voice") not in VOICE_OPTIONS:
+                raise ValueError(
+                    f"{job['path']}: unknown voice {character.get('voice')!r}; choose from {', '.join(VOICE_OPTIONS)}"
+                )
+    dialogue_style = job.get("dialogue_style")
+    if dialogue_style is not None and dialogue_style not in DIALOGUE_STYLES:
+        raise ValueError(
+            f"{job['path']}: unknown dialogue_style {dialogue_style!r}; choose from {', '.join(DIALOGUE_STYLES)}"
+        )
+    assembly_options = job.get("assembly_options")
+    if assembly_options is not None:
+        unknown = set(assembly_options) - {"gap_seconds", "crossfade_seconds", "target_dbfs"}
+        if unknown:
+            raise ValueError(f"{job['path']}: unknown assembly_options {', '.join(sorted(unknown))}")
+
+
+def _read_manifest(input_path):
+    with open(input_path, encoding="utf-8") as f:
+        if input_path.endswith(".jsonl"):
+            jobs = [json.loads(line) for line in f if line.strip()]
+        else:
+            jobs = json.load(f)
+    # Relative document paths are resolved against the manifest's folder
+    manifest_dir = os.path.dirname(os.path.abspath(input_path))
+    for job in jobs:
+        if isinstance(job.get("path"), str):
+            job["path"] = os.path.join(manifest_dir, job["path"])
+    return jobs
+
+
+def job_output_dir(output_root, job):
+    """Return the per-document output folder, named after the document's file name including its extension."""
+    return os.path.join(output_root, job.get("name") or sanitize_filename(os.path.basename(job["path"])))
+
+
+def write_status(output_dir, **status):
+    status["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    temp_path = os.path.join(output_dir, "status.json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, os.path.join(output_dir, "status.json"))
+
+
+def run_job(job, output_root, force_refresh=False, output_formats=()):
+    """Extract, script and synthesize one document; returns the episode path."""
+    output_dir = job_output_dir(output_root, job)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def on_stage(stage):
+        write_status(output_dir, status="running", stage=stage, source=job["path"])
+
+    try:
+        content_path = os.path.join(output_dir, "content.txt")
+        if os.path.exists(content_path):
+            with open(content_path, encoding="utf-8") as f:
+                content = f.read()
+        else:
+            on_stage("extract")
+            with open(job["path"], "rb") as f:
+                content = extract_text_from_file(os.path.basename(job["path"]), f.read())
+            with open(content_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+        episode_path = generate_episode(
+            content,
+            output_dir,
+            characters=job.get("characters"),
+            dialogue_style=job.get("dialogue_style"),
+            force_refresh=force_refresh,
+            on_stage=on_stage,
+            assembly_options=job.get("assembly_options"),
+            output_formats=output_formats,
+        )
+    except Exception as e:
+        # Any failure is recorded, so a resumed run and the summary both see it
+        write_status(output_dir, status="failed", error=str(e) or type(e).__name__, source=job["path"])
+        raise
+    write_status(output_dir, status="done", episode=episode_path, source=job["path"])
+    return episode_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-generate podcast episodes from documents.")
+    parser.add_argument("input", help="directory of documents, or a .json/.jsonl manifest")
+    parser.add_argument("-o", "--output-dir", default="episodes", help="where episode folders are written")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="documents processed in parallel")
+    parser.add_argument("--force", action="store_true", help="ignore cached LLM responses")
+    parser.add_argument(
+        "--formats", default="", help="extra outputs besides episode.mp3, comma-separated: hls, opus"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    output_formats = tuple(name.strip() for name in args.formats.split(",") if name.strip())
+    unknown = set(output_formats) - {"hls", "opus"}
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+    try:
+        jobs = load_jobs(args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    if not jobs:
+        logger.error("No documents found in %s", args.input)
+        return 1
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(run_job, job, args.output_dir, args.force, output_formats): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                logger.info("Finished %s -> %s", job["path"], future.result())
+            except Exception as e:
+                failures += 1
+                logger.error("Failed %s: %s", job["path"], e, exc_info=not isinstance(e, (PodcastError, OSError)))
+
+    logger.info("%d/%d episodes generated", len(jobs) - failures, len(jobs))
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "metrics.prom"), "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Offline benchmark and load test for the podcast pipeline.
+
+Everything runs against the local stub servers in stub_servers.py, so no API credits
+are spent. From the repository root:
+
+    python -m benchmarks.run_benchmarks [--sizes 10 50 200] [--sessions 8] [--compare OLD.json]
+
+Stage timings (extraction, dialogue parsing, synthesis, concatenation) and the
+end-to-end load test (p50/p95 latency, peak RSS) are printed and saved to
+benchmarks/results/<commit>-<timestamp>.json. Pass --compare with an earlier result
+file to print the change for every metric.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_servers import MinimaxStubHandler, OpenAIStubHandler, StubServer, canned_dialogue, fake_mp3
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTENCES = [
+    "The committee reviewed the quarterly results and the outlook for the coming year.",
+    "Revenue growth was driven mainly by new customers in the enterprise segment.",
+    "Operating costs rose because of investments in research and infrastructure.",
+    "Management expects margins to recover as the new platform reaches scale.",
+    "Several risks remain, including supply chain delays and currency movements.",
+]
+
+
+def synthetic_lines(count, seed=0):
+    return [f"{SENTENCES[(seed + i) % len(SENTENCES)]} ({seed}.{i})" for i in range(count)]
+
+
+def write_pdf(path, pages, lines_per_page=40):
+    """Write a plain-text PDF with a running header and footer on every page."""
+    page_objects = []
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        lines = ["Benchmark Holdings Annual Report - Confidential"]
+        lines += synthetic_lines(lines_per_page, seed=page)
+        lines.append(f"Page {page + 1} of {pages}")
+        text = " T* ".join("(" + line.replace("(", "[").replace(")", "]") + ") Tj" for line in lines)
+        stream = f"BT /F1 9 Tf 12 TL 40 770 Td {text} ET".encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_objects.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [" + b" ".join(page_objects) + b"] /Count %d >>" % pages
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        output += b"%010d 00000 n \n" % offsets[object_id]
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def write_docx(path, paragraphs):
+    import docx
+
+    document = docx.Document()
+    for line in synthetic_lines(paragraphs):
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_extraction(pipeline, sizes, workdir, metrics):
+    for pages in sizes:
+        pdf_path = os.path.join(workdir, f"report_{pages}.pdf")
+        write_pdf(pdf_path, pages)
+        with open(pdf_path, "rb") as f:
+            data = f.read()
+        seconds, text = timed(pipeline.extract_text_from_file, "report.pdf", data)
+        metrics[f"extract.pdf.{pages}_pages.seconds"] = seconds
+        metrics[f"extract.pdf.{pages}_pages.chars"] = len(text)
+        seconds, compaction = timed(pipeline.compact_content, text)
+        metrics[f"compact.pdf.{pages}_pages.seconds"] = seconds
+        metrics[f"compact.pdf.{pages}_pages.tokens_before"] = compaction.tokens_before
+        metrics[f"compact.pdf.{pages}_pages.tokens_after"] = compaction.tokens_after
+
+        docx_path = os.path.join(workdir, f"report_{pages}.docx")
+        write_docx(docx_path, pages * 40)
+        with open(docx_path, "rb") as f:
+            data = f.read()
+        seconds, _ = timed(pipeline.extract_text_from_file, "report.docx", data)
+        metrics[f"extract.docx.{pages * 40}_paragraphs.seconds"] = seconds
+
+
+def bench_dialogue_parsing(metrics, repeat=200):
+    from json_stream import JsonArrayStreamParser
+
+    text = "```json\n" + json.dumps(canned_dialogue("Alice", "Bob"), ensure_ascii=False, indent=2) + "\n```"
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser = JsonArrayStreamParser()
+        for i in range(0, len(text), 16):
+            parser.feed(text[i:i + 16])
+    metrics["parse.stream.ms_per_script"] = (time.perf_counter() - start) / repeat * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(text.strip("`").removeprefix("json"))
+    metrics["parse.json_loads.ms_per_script"] = (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_synthesis(pipeline, workdir, metrics, line_count=15):
+    for streaming in (False, True):
+        for concurrency in (1, pipeline.TTS_MAX_CONCURRENCY):
+            nonce = uuid.uuid4().hex[:8]
+            lines = [(i + 1, f"{text} {nonce}", "presenter_male") for i, text in enumerate(synthetic_lines(line_count))]
+            output_dir = tempfile.mkdtemp(dir=workdir)
+            seconds, results = timed(
+                pipeline.synthesize_lines_concurrently, lines, output_dir,
+                max_in_flight=concurrency, streaming=streaming,
+            )
+            mode = "stream" if streaming else "json"
+            metrics[f"synthesize.{mode}.{line_count}_lines.concurrency_{concurrency}.seconds"] = seconds
+            metrics[f"synthesize.{mode}.{line_count}_lines.concurrency_{concurrency}.failed"] = sum(
+                1 for _, path, _ in results if not path
+            )
+
+
+def bench_concatenation(pipeline, workdir, metrics):
+    for segment_count in (15, 100, 500):
+        segment_dir = tempfile.mkdtemp(dir=workdir)
+        paths = []
+        for i, text in enumerate(synthetic_lines(segment_count)):
+            path = os.path.join(segment_dir, f"line_{i + 1}.mp3")
+            with open(path, "wb") as f:
+                f.write(fake_mp3(text))
+            paths.append(path)
+        seconds, _ = timed(pipeline.concatenate_audio_files, paths, os.path.join(segment_dir, "final.mp3"))
+        metrics[f"concatenate.{segment_count}_segments.seconds"] = seconds
+
+
+def load_test(pipeline, sessions, workdir, metrics):
+    """Run `sessions` full episodes concurrently, as that many users of one app server would."""
+    content = "\n\n".join(synthetic_lines(200))
+
+    def session(index):
+        output_dir = os.path.join(workdir, f"session_{index}")
+        # Unique content per session keeps the LLM cache from short-circuiting the run
+        seconds, _ = timed(pipeline.generate_episode, f"{content}\n\nsession {index} {uuid.uuid4().hex}", output_dir)
+        return seconds
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        latencies = list(executor.map(session, range(sessions)))
+    metrics[f"load.{sessions}_sessions.wall_seconds"] = time.perf_counter() - start
+    metrics[f"load.{sessions}_sessions.p50_seconds"] = percentile(latencies, 0.5)
+    metrics[f"load.{sessions}_sessions.p95_seconds"] = percentile(latencies, 0.95)
+    metrics[f"load.{sessions}_sessions.mean_seconds"] = statistics.mean(latencies)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def compare(previous_path, metrics):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous['commit']} ({previous['timestamp']}):")
+    for name, value in sorted(metrics.items()):
+        old = previous["metrics"].get(name)
+        if old is None:
+            print(f"  {name:60s} {value:12.4f}   (new)")
+        elif old:
+            print(f"  {name:60s} {value:12.4f}   {(value - old) / old:+8.1%}")
+        else:
+            print(f"  {name:60s} {value:12.4f}   (was {old})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the podcast pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="PDF page counts to extract")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions in the load test")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="mean Minimax stub latency (s)")
+    parser.add_argument("--tts-429-rate", type=float, default=0.05, help="fraction of Minimax stub 429s")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean LLM stub latency (s)")
+    parser.add_argument("--skip", nargs="*", default=[],
+                        choices=["extract", "parse", "synthesize", "concatenate", "load"])
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--output", help="where to write results (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="podcast_bench_")
+    minimax_stub = StubServer(MinimaxStubHandler, latency=args.tts_latency, rate_429=args.tts_429_rate)
+    llm_stub = StubServer(OpenAIStubHandler, latency=args.llm_latency)
+    with minimax_stub, llm_stub:
+        # The pipeline reads its configuration at import time, so point it at the stubs first
+        os.environ.update({
+            "GEMINI_API_KEY": "stub",
+            "GEMINI_BASE_URL": llm_stub.base_url + "/",
+            "MINIMAX_API_KEY": "stub",
+            "MINIMAX_GROUP_ID": "benchmark",
+            "MINIMAX_API_URL_TEMPLATE": minimax_stub.base_url + "/v1/t2a_v2?GroupId={group_id}",
+            "TTS_CACHE_DIR": os.path.join(workdir, "tts_cache"),
+            "LLM_CACHE_DIR": os.path.join(workdir, "llm_cache"),
+            "RETRY_BASE_DELAY": "0.05",
+        })
+        sys.path.insert(0, REPO_ROOT)
+        import pipeline
+
+        metrics = {}
+        stages = [
+            ("extract", lambda: bench_extraction(pipeline, args.sizes, workdir, metrics)),
+            ("parse", lambda: bench_dialogue_parsing(metrics)),
+            ("synthesize", lambda: bench_synthesis(pipeline, workdir, metrics)),
+            ("concatenate", lambda: bench_concatenation(pipeline, workdir, metrics)),
+            ("load", lambda: load_test(pipeline, args.sessions, workdir, metrics)),
+        ]
+        for name, run in stages:
+            if name in args.skip:
+                continue
+            print(f"Running {name} benchmarks...", flush=True)
+            run()
+        import telemetry
+
+        for row in telemetry.summarize_spans(telemetry.recent_spans()):
+            metrics[f"stage.{row['stage']}.mean_seconds"] = row["mean_s"]
+            metrics[f"stage.{row['stage']}.p95_seconds"] = row["p95_s"]
+        metrics["peak_rss_mb"] = peak_rss_mb()
+        metrics["stub.minimax_requests"] = minimax_stub.requests_served
+        metrics["stub.llm_requests"] = llm_stub.requests_served
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        "metrics": metrics,
+    }
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"{result['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    for name, value in sorted(metrics.items()):
+        print(f"  {name:60s} {value:12.4f}")
+    print(f"Results written to {output_path}")
+    if args.compare:
+        compare(args.compare, metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
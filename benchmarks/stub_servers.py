@@ -0,0 +1,236 @@
+"""
+Local stand-ins for the Minimax t2a_v2 endpoint and the OpenAI-compatible chat endpoint.
+
+Both servers run in a background thread and cost nothing to call, so the pipeline can be
+benchmarked and load-tested offline. Point the app at them with
+MINIMAX_API_URL_TEMPLATE and GEMINI_BASE_URL (see run_benchmarks.py).
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-1 Layer III frame: 32 kHz, 128 kbps, mono, 36 ms of audio
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x98, 0xC4]) + bytes(572)
+FRAME_SECONDS = 1152 / 32000
+# Rough speaking rate used to size the fake audio
+SECONDS_PER_CHAR = 0.2
+FRAMES_PER_STREAM_EVENT = 32
+
+
+def fake_mp3(text):
+    """Return silent MP3 audio about as long as `text` would take to read aloud."""
+    frame_count = max(1, int(len(text) * SECONDS_PER_CHAR / FRAME_SECONDS))
+    return SILENT_MP3_FRAME * frame_count
+
+
+def canned_dialogue(char1_name, char2_name, turns=15):
+    """Return a dialogue script in the format generate_dialogue_openai expects."""
+    # A per-response nonce keeps lines unique, so load tests exercise synthesis rather than the cache
+    nonce = uuid.uuid4().hex[:8]
+    return [
+        {
+            "speaker": char1_name if i % 2 == 0 else char2_name,
+            "line": f"这是第 {i + 1} 轮对话，我们继续讨论这个话题的关键细节和实际应用。（{nonce}）",
+        }
+        for i in range(turns)
+    ]
+
+
+class StubServer:
+    """Run an HTTP handler class on a free local port in a daemon thread."""
+
+    def __init__(self, handler_class, **settings):
+        self.settings = settings
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(handler_class):
+            stub = server
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        """Count a request and return how many have been served, this one included."""
+        with self._lock:
+            self.requests_served += 1
+            return self.requests_served
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    stub = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, status, body, extra_headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_event_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def simulate_latency(self, key):
+        latency = self.stub.settings.get(key, 0.0)
+        if latency:
+            time.sleep(random.uniform(0.5, 1.5) * latency)
+
+
+class MinimaxStubHandler(_JsonHandler):
+    """
+    Fake t2a_v2 endpoint returning hex-encoded silent MP3.
+
+    Settings: `latency` (mean seconds per request) and `rate_429` (probability of a
+    429 response with Retry-After). Honours "stream": true with server-sent events.
+    Failure modes for tests: `error_body` (a dict sent as the JSON response, as Minimax
+    does for bad credentials or throttling), `stream_error_after` (number of audio events
+    before an event whose base_resp carries `stream_error_code`, 1000 by default),
+    `failing_requests` (only the first this many requests fail; all of them by default)
+    and `stream_hex_chars` (hex digits per audio event; an odd count splits bytes across
+    events).
+    """
+
+    def do_POST(self):
+        request_number = self.stub.count_request()
+        payload = self.read_json()
+        failing_requests = self.stub.settings.get("failing_requests")
+        failing = failing_requests is None or request_number <= failing_requests
+        if random.random() < self.stub.settings.get("rate_429", 0.0):
+            self.send_json(429, {"base_resp": {"status_code": 1002, "status_msg": "rate limit"}},
+                           {"Retry-After": "0.2"})
+            return
+        self.simulate_latency("latency")
+        error_body = self.stub.settings.get("error_body")
+        if error_body is not None and failing:
+            self.send_json(200, error_body)
+            return
+        audio = fake_mp3(payload.get("text", ""))
+
+        if not payload.get("stream"):
+            self.send_json(200, {
+                "data": {"audio": audio.hex(), "status": 2},
+                "base_resp": {"status_code": 0, "status_msg": "success"},
+            })
+            return
+
+        self.start_event_stream()
+        hex_audio = audio.hex()
+        chunk_size = self.stub.settings.get("stream_hex_chars") or len(SILENT_MP3_FRAME) * FRAMES_PER_STREAM_EVENT * 2
+        error_after = self.stub.settings.get("stream_error_after") if failing else None
+        for index, start in enumerate(range(0, len(hex_audio), chunk_size)):
+            if index == error_after:
+                status_code = self.stub.settings.get("stream_error_code", 1000)
+                status_msg = "rate limit" if status_code == 1002 else "unknown error"
+                self.send_event({"data": None, "base_resp": {"status_code": status_code, "status_msg": status_msg}})
+                return
+            self.send_event({"data": {"audio": hex_audio[start:start + chunk_size], "status": 1}})
+        self.send_event({
+            "data": {"audio": audio.hex(), "status": 2},
+            "base_resp": {"status_code": 0, "status_msg": "success"},
+        })
+
+
+class OpenAIStubHandler(_JsonHandler):
+    """
+    Fake OpenAI-compatible /chat/completions endpoint serving canned JSON.
+
+    Recommendation, summary and dialogue prompts are told apart by their system message.
+    Settings: `latency` (mean seconds before the first token) and `stream_chunk_chars`.
+    """
+
+    def completion_text(self, messages):
+        system = messages[0]["content"] if messages else ""
+        prompt = messages[-1]["content"] if messages else ""
+        if "推荐" in system:
+            return json.dumps({
+                "characters": [{"name": "小林", "voice": "男性主持人"}, {"name": "小雅", "voice": "女性主持人"}],
+                "dialogue_style": "专业深入",
+            }, ensure_ascii=False)
+        if "提炼" in system:
+            return "要点一：核心概念。\n要点二：关键案例。\n要点三：未来影响。"
+        names = re.search(r"为两个角色（(.+?) 和 (.+?)）", prompt)
+        char1_name, char2_name = names.groups() if names else ("Alice", "Bob")
+        dialogue = json.dumps(canned_dialogue(char1_name, char2_name), ensure_ascii=False, indent=2)
+        return f"```json\n{dialogue}\n```"
+
+    def do_POST(self):
+        self.stub.count_request()
+        body = self.read_json()
+        text = self.completion_text(body.get("messages", []))
+        self.simulate_latency("latency")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            self.send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)},
+            })
+            return
+
+        self.start_event_stream()
+        chunk_chars = self.stub.settings.get("stream_chunk_chars", 16)
+        for start in range(0, len(text), chunk_chars):
+            self.send_event({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": text[start:start + chunk_chars]}, "finish_reason": None}],
+            })
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self.send_event({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "stub"),
+                "choices": [],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)},
+            })
+        self.send_event("[DONE]")
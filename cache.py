@@ -0,0 +1,144 @@
+"""Persistent on-disk cache shared by all app sessions on this machine."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+def make_cache_key(*parts):
+    """Return a stable SHA-256 hex digest for a tuple of JSON-serializable key parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed file cache with a total size cap and LRU eviction.
+
+    Entries are written to a temporary file and moved into place with os.replace, so
+    readers never see partial files even when several sessions or processes share
+    the same directory. Recency is tracked through file modification times, which
+    are refreshed on every hit.
+
+    With `ttl_seconds` set, entries expire that long after they were written; hits then
+    leave modification times alone so entries keep aging, and eviction is oldest-first.
+    """
+
+    def __init__(self, directory, max_bytes, suffix="", ttl_seconds=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _entries(self):
+        """Yield (path, mtime, size) for every cache entry on disk."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix) or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _is_expired(self, mtime):
+        return self.ttl_seconds is not None and time.time() - mtime > self.ttl_seconds
+
+    def get(self, key):
+        """Return the cached bytes for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                if self._is_expired(os.fstat(f.fileno()).st_mtime):
+                    raise FileNotFoundError(path)
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        if self.ttl_seconds is None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Atomically store `data` under `key` and evict old entries if over the size cap."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            over_cap = self._commit(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        if over_cap:
+            self.evict()
+
+    def put_file(self, key, source_path):
+        """Atomically copy the file at `source_path` into the cache under `key`, without reading it into memory."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, temp_path)
+            over_cap = self._commit(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        if over_cap:
+            self.evict()
+
+    def _commit(self, temp_path, path):
+        """Move a written temp file into place as an entry; returns whether the cache is now over its cap."""
+        with self._lock:
+            # Two sessions synthesizing the same line both store it; only the last copy stays on disk
+            try:
+                replaced_bytes = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_bytes = 0
+            os.replace(temp_path, path)
+            self._total_bytes += os.path.getsize(path) - replaced_bytes
+            return self._total_bytes > self.max_bytes
+
+    def evict(self):
+        """Delete expired entries, then least recently used ones until within 90% of the cap."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            target = int(self.max_bytes * 0.9)
+            for path, mtime, size in entries:
+                if total <= target and not self._is_expired(mtime):
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._total_bytes = total
+
+    def stats(self):
+        """Return hit/miss counters and the approximate size of the cache in bytes."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._total_bytes}
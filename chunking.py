@@ -0,0 +1,75 @@
+"""Token estimation and boundary-aware chunking of long documents."""
+import re
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+_BLOCK_SEPARATOR = re.compile(r"\f|\n\s*\n")
+
+
+def estimate_tokens(text):
+    """
+    Roughly estimate the number of LLM tokens in `text`.
+
+    CJK characters count as one token each and other text as one token per four
+    characters, which is close enough for budgeting prompts without a tokenizer.
+    """
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Return the longest prefix of `text` whose estimated token count is within `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # The estimate only grows as the prefix does, so binary-search the cut
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def _iter_pieces(text, max_tokens):
+    """Yield pages/paragraphs, falling back to lines and then fixed-size slices for oversized blocks."""
+    for block in _BLOCK_SEPARATOR.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        if estimate_tokens(block) <= max_tokens:
+            yield block
+            continue
+        for line in block.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if estimate_tokens(line) <= max_tokens:
+                yield line
+                continue
+            # A token never spans less than one character, so max_tokens characters always fit
+            for start in range(0, len(line), max_tokens):
+                yield line[start:start + max_tokens]
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split `text` into chunks of at most about `max_tokens` tokens each.
+
+    Chunks break at page and paragraph boundaries where possible, so each one can be
+    summarized on its own without cutting through the middle of a passage.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in _iter_pieces(text, max_tokens):
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
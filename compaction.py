@@ -0,0 +1,159 @@
+"""
+Compaction of extracted documents before they are sent to the LLM.
+
+PDF text in particular repeats the running header and footer on every page, breaks words
+with hyphens at line ends and carries runs of whitespace; all of it is billed as prompt
+tokens. Compaction removes that noise without touching the wording of the content.
+"""
+import re
+from collections import Counter, namedtuple
+
+from chunking import estimate_tokens
+
+CompactionResult = namedtuple(
+    "CompactionResult", "text chars_before chars_after tokens_before tokens_after removed_lines"
+)
+
+# Running headers/footers sit within this many lines of a page's top or bottom
+_EDGE_LINES = 3
+# A line is boilerplate when it is on the edge of at least this share of pages (and 3 pages)
+_BOILERPLATE_PAGE_SHARE = 0.5
+# Page numbers are masked only in lines this short, so body text differing in its figures stays
+_MAX_NUMBERED_FURNITURE_CHARS = 40
+# A PDF line at least this share of the page's longest line was wrapped, not ended, by the layout
+_WRAPPED_LINE_SHARE = 0.8
+# Shorter repeated paragraphs ("是的", "Summary") may be meaningful and are kept
+_MIN_DUPLICATE_PARAGRAPH_CHARS = 30
+
+_INVISIBLE = re.compile("[\u00ad\u200b\u200c\u200d\u2060\ufeff]")
+_HORIZONTAL_SPACE = re.compile(r"[ \t\u00a0\u2000-\u200a\u202f\u3000]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_CJK_CHAR = re.compile(r"[\u3400-\u9fff]")
+_WIDE_CHARS = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+_CJK_CONTINUATION = re.compile(r"[\u3400-\u9fff\uff0c\u3001]")
+_SENTENCE_FINAL = frozenset("。！？；：…!?;:")
+_LIST_ITEM = re.compile(
+    r"^(?:[一二三四五六七八九十百]+[、.．]|[(（]?\d+[)）.、．]|第[一二三四五六七八九十百\d]+[章节条部分篇]|[•·●▪■◆*-])"
+)
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(
+    r"^(?:[-–—\s]*(?:page|p\.)?\s*\d{1,3}(?:\s*(?:/|of)\s*\d+)?[-–—\s]*|第\s*\d+\s*页(?:\s*[/，,]?\s*共\s*\d+\s*页)?)$",
+    re.IGNORECASE,
+)
+
+
+def _signature(line):
+    """Compare headers/footers case-insensitively, with page numbers masked out of short lines."""
+    line = line.casefold()
+    return _DIGITS.sub("#", line) if len(line) <= _MAX_NUMBERED_FURNITURE_CHARS else line
+
+
+def _clean_lines(text):
+    text = _INVISIBLE.sub("", text.replace("\r\n", "\n").replace("\r", "\n"))
+    return [_HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.split("\n")]
+
+
+def _edge_indexes(lines):
+    """Indexes of the first and last few non-empty lines of a page."""
+    filled = [i for i, line in enumerate(lines) if line]
+    return set(filled[:_EDGE_LINES] + filled[-_EDGE_LINES:])
+
+
+def _display_width(line):
+    """Width of a line in Latin character cells; CJK characters take two."""
+    return len(line) + len(_WIDE_CHARS.findall(line))
+
+
+def _unwrap_page(lines):
+    """
+    Rejoin PDF lines the layout wrapped mid-sentence: hyphenated words and CJK text.
+
+    A CJK line only continues onto the next when it runs (nearly) to the page's full
+    width, does not end a sentence and the next line does not start a list item or
+    heading. Other lines stay separate, since a newline costs no more than a space.
+    """
+    full_width = max((_display_width(line) for line in lines), default=0)
+    unwrapped = []
+    last_width = 0
+    for line in lines:
+        previous = unwrapped[-1] if unwrapped else ""
+        if previous and previous.endswith("-") and previous[-2:-1].islower() and line[:1].islower():
+            unwrapped[-1] = previous[:-1] + line
+        elif (
+            previous and line
+            and last_width >= _WRAPPED_LINE_SHARE * full_width
+            and previous[-1] not in _SENTENCE_FINAL
+            and _CJK_CONTINUATION.match(previous[-1])
+            and _CJK_CHAR.match(line)
+            and not _LIST_ITEM.match(line)
+        ):
+            unwrapped[-1] = previous + line
+        else:
+            unwrapped.append(line)
+        last_width = _display_width(line)
+    return unwrapped
+
+
+def _strip_page_furniture(pages):
+    """Drop page numbers and running headers/footers from pages of cleaned lines; returns lines removed."""
+    edge_signatures = Counter()
+    for lines in pages:
+        edge_signatures.update({_signature(lines[i]) for i in _edge_indexes(lines)})
+    threshold = max(3, _BOILERPLATE_PAGE_SHARE * len(pages))
+    boilerplate = {signature for signature, count in edge_signatures.items() if count >= threshold}
+
+    removed = 0
+    for lines in pages:
+        for i in _edge_indexes(lines):
+            if _signature(lines[i]) in boilerplate or _PAGE_NUMBER.match(lines[i]):
+                lines[i] = ""
+                removed += 1
+    return removed
+
+
+def _drop_duplicate_paragraphs(text):
+    """Keep only the first copy of long paragraphs that repeat verbatim (disclaimers, copyright notices)."""
+    seen = set()
+    kept = []
+    removed = 0
+    for paragraph in text.split("\n\n"):
+        key = paragraph.casefold()
+        if len(paragraph) >= _MIN_DUPLICATE_PARAGRAPH_CHARS and key in seen:
+            removed += paragraph.count("\n") + 1
+            continue
+        seen.add(key)
+        kept.append(paragraph)
+    return "\n\n".join(kept), removed
+
+
+def compact_text(text):
+    """
+    Remove layout noise from extracted document text and report what it saved.
+
+    Pages are separated by form feeds (as text_extraction produces for PDFs). On paged
+    text, lines that recur at the top or bottom of at least half the pages (running
+    headers and footers, compared with digits masked in short lines so "Page 3 of 9"
+    matches "Page 4 of 9") are dropped, as are bare page numbers there, and lines the
+    layout wrapped mid-word or mid-sentence are rejoined (see _unwrap_page). Text without
+    pages (.txt, .docx, pasted) keeps its line structure. For all input, whitespace runs
+    collapse to one space or one blank line and long paragraphs repeated verbatim are
+    kept once. Returns a CompactionResult.
+    """
+    pages = [_clean_lines(page) for page in text.split("\f")]
+    removed = 0
+    if len(pages) > 1:
+        if len(pages) >= 3:
+            removed = _strip_page_furniture(pages)
+        pages = [_unwrap_page(lines) for lines in pages]
+
+    compacted = "\n\n".join("\n".join(lines).strip() for lines in pages)
+    compacted = _BLANK_LINES.sub("\n\n", compacted).strip()
+    compacted, duplicates = _drop_duplicate_paragraphs(compacted)
+    return CompactionResult(
+        compacted,
+        len(text),
+        len(compacted),
+        estimate_tokens(text),
+        estimate_tokens(compacted),
+        removed + duplicates,
+    )
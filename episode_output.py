@@ -0,0 +1,167 @@
+"""
+Episode output formats beyond the single MP3: chapter markers, HLS playlists and Opus.
+
+Chapters come from the dialogue turns, so players can show and seek to every turn. HLS
+turns each turn's segment into one MPEG-TS media segment, encoded in parallel, under a VOD
+playlist. It is an export for hosting a finished episode on a static server or CDN, where
+players fetch only the segments they play: it is written after the episode is assembled,
+and neither the app nor its media server plays it. Opus gives a much smaller download.
+"""
+import json
+import math
+import os
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
+from audio_assembly import find_ffmpeg
+from mp3_concat import mp3_duration
+
+Chapter = namedtuple("Chapter", "start end title")
+
+HLS_PLAYLIST_NAME = "playlist.m3u8"
+
+
+class EpisodeOutputError(RuntimeError):
+    """Raised when an output format cannot be produced."""
+
+
+def _run_ffmpeg(arguments):
+    result = subprocess.run(
+        [find_ffmpeg(EpisodeOutputError), "-v", "error", "-y", *arguments], capture_output=True
+    )
+    if result.returncode != 0:
+        raise EpisodeOutputError(result.stderr.decode("utf-8", "replace").strip())
+
+
+def build_chapters(durations, titles, gap_seconds=0.0, crossfade_seconds=0.0):
+    """
+    Return one Chapter per turn from segment durations and titles.
+
+    `gap_seconds` and `crossfade_seconds` must match what the episode was assembled with
+    (see concatenate_audio_files), so chapter starts line up with the audio.
+    """
+    offset = gap_seconds if gap_seconds else -crossfade_seconds
+    chapters = []
+    start = 0.0
+    for index, (duration, title) in enumerate(zip(durations, titles)):
+        end = start + duration
+        chapters.append(Chapter(round(start, 3), round(end, 3), title))
+        start = max(0.0, end + offset) if index < len(durations) - 1 else end
+    return chapters
+
+
+def _format_vtt_time(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def write_chapters(chapters, output_dir):
+    """Write chapters.json (Podcasting 2.0 JSON chapters) and chapters.vtt; returns both paths."""
+    json_path = os.path.join(output_dir, "chapters.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": "1.2.0",
+                "chapters": [
+                    {"startTime": chapter.start, "endTime": chapter.end, "title": chapter.title}
+                    for chapter in chapters
+                ],
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    vtt_path = os.path.join(output_dir, "chapters.vtt")
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n")
+        for index, chapter in enumerate(chapters, start=1):
+            f.write(f"\n{index}\n{_format_vtt_time(chapter.start)} --> {_format_vtt_time(chapter.end)}\n{chapter.title}\n")
+    return json_path, vtt_path
+
+
+def read_chapters(output_dir):
+    """Return the Chapters from `output_dir`/chapters.json, or an empty list when there is none."""
+    try:
+        with open(os.path.join(output_dir, "chapters.json"), encoding="utf-8") as f:
+            entries = json.load(f)["chapters"]
+    except FileNotFoundError:
+        return []
+    return [Chapter(entry["startTime"], entry.get("endTime", entry["startTime"]), entry["title"]) for entry in entries]
+
+
+def _write_playlist(path, segments):
+    """Write an HLS VOD playlist for (file name, duration) segments, atomically."""
+    target_duration = max((math.ceil(duration) for _, duration in segments), default=1)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for name, duration in segments:
+        lines += [f"#EXTINF:{duration:.3f},", name]
+    lines.append("#EXT-X-ENDLIST")
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+def package_hls(segment_paths, output_dir, codec="aac", bitrate="64k", max_workers=4):
+    """
+    Package per-turn MP3 segments as an HLS stream in `output_dir`; returns the playlist path.
+
+    Each segment becomes one MPEG-TS file, either re-encoded to AAC (`codec="aac"`) or
+    with its MP3 frames copied as is (`codec="copy"`, no encoding at all). Segments are
+    encoded in parallel with timestamps offset to their place in the episode, and the
+    playlist is written once all of them exist. Segments are joined back to back; pauses
+    and crossfades only apply to the single-file MP3.
+    """
+    if codec not in ("aac", "copy"):
+        raise ValueError(f"Unsupported HLS codec: {codec}")
+    os.makedirs(output_dir, exist_ok=True)
+    durations = [mp3_duration(path) for path in segment_paths]
+    offsets = [0.0, *accumulate(durations)][:-1]
+    codec_arguments = ["-c:a", "aac", "-b:a", bitrate] if codec == "aac" else ["-c:a", "copy"]
+
+    def encode(index):
+        name = f"segment_{index:05d}.ts"
+        _run_ffmpeg([
+            "-i", segment_paths[index], "-vn", *codec_arguments,
+            "-output_ts_offset", f"{offsets[index]:.3f}", "-f", "mpegts", os.path.join(output_dir, name),
+        ])
+        return name
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        names = list(executor.map(encode, range(len(segment_paths))))
+    playlist_path = os.path.join(output_dir, HLS_PLAYLIST_NAME)
+    _write_playlist(playlist_path, list(zip(names, durations)))
+    return playlist_path
+
+
+def encode_opus(input_path, output_path, chapters=None, bitrate="32k"):
+    """Encode an episode to Ogg Opus at `bitrate` (speech sounds fine at 24-32 kbps), embedding chapters."""
+    arguments = ["-i", input_path]
+    metadata_path = None
+    if chapters:
+        metadata_path = output_path + ".ffmetadata"
+        with open(metadata_path, "w", encoding="utf-8") as f:
+            f.write(";FFMETADATA1\n")
+            for chapter in chapters:
+                title = chapter.title.replace("\\", "\\\\").replace("=", "\\=").replace(";", "\\;")
+                title = title.replace("#", "\\#").replace("\n", " ")
+                f.write(
+                    f"[CHAPTER]\nTIMEBASE=1/1000\nSTART={int(chapter.start * 1000)}\n"
+                    f"END={int(chapter.end * 1000)}\ntitle={title}\n"
+                )
+        arguments += ["-i", metadata_path, "-map", "0:a", "-map_chapters", "1"]
+    try:
+        _run_ffmpeg([*arguments, "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", output_path])
+    finally:
+        if metadata_path and os.path.exists(metadata_path):
+            os.unlink(metadata_path)
+    return output_path
@@ -0,0 +1,236 @@
+"""
+Persistent background job queue shared by every session of the app process.
+
+Jobs are stored in SQLite, so they outlive the browser tab that submitted them and are
+picked up again after a restart. A fixed pool of worker threads runs them; the next job
+always goes to the owner with the fewest running jobs, then the one served least
+recently, so one user queueing many episodes cannot starve the others.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at);
+"""
+
+# Fewest running jobs first, then the owner whose last job started longest ago, then FIFO
+_NEXT_JOB = """
+SELECT id FROM jobs AS queued
+WHERE status = 'queued'
+ORDER BY
+    (SELECT COUNT(*) FROM jobs WHERE owner = queued.owner AND status = 'running'),
+    COALESCE((SELECT MAX(started_at) FROM jobs WHERE owner = queued.owner), 0),
+    created_at
+LIMIT 1
+"""
+
+
+class JobQueue:
+    """
+    SQLite-backed queue executing jobs on `workers` daemon threads.
+
+    `handlers` maps a job kind to `handler(job_id, params, set_stage)`, which returns a
+    JSON-serializable result or raises; `set_stage(stage)` records progress that status
+    polls can show. Jobs left running by a previous process are queued again on start,
+    so handlers should be able to resume (generate_episode is).
+    """
+
+    def __init__(self, db_path, handlers, workers=2, retention_seconds=24 * 3600, on_purge=None):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.retention_seconds = retention_seconds
+        self.on_purge = on_purge
+        self._wakeup = threading.Condition()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            resumed = db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+        if resumed:
+            logger.info("Re-queued %d jobs interrupted by a restart", resumed)
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._work, daemon=True, name=f"job-worker-{i}").start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return _Transaction(db)
+
+    def submit(self, owner, kind, params, job_id=None):
+        """Queue a job and return its id."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, owner, kind, params, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, owner, kind, json.dumps(params, ensure_ascii=False), time.time()),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict (params, result decoded), or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def list_jobs(self, owner, limit=20):
+        """Return the owner's most recent jobs, newest first."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def queue_position(self, job_id):
+        """
+        Return how many queued jobs will start before this one (0 when it is next or not queued).
+
+        Replays the fair-share order of _NEXT_JOB, assuming no running job finishes meanwhile.
+        """
+        with self._connect() as db:
+            pending = db.execute(
+                "SELECT id, owner, created_at FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+            # owner -> [running jobs, last start], the first two keys of _NEXT_JOB
+            owners = {
+                row["owner"]: [row["running"], row["last_started"] or 0]
+                for row in db.execute(
+                    "SELECT owner, SUM(status = 'running') AS running, MAX(started_at) AS last_started "
+                    "FROM jobs GROUP BY owner"
+                )
+            }
+        if job_id not in {row["id"] for row in pending}:
+            return 0
+        clock = time.time()
+        position = 0
+        while True:
+            job = min(pending, key=lambda row: (*owners[row["owner"]], row["created_at"]))
+            if job["id"] == job_id:
+                return position
+            pending.remove(job)
+            clock += 1
+            owners[job["owner"]][0] += 1
+            owners[job["owner"]][1] = clock
+            position += 1
+
+    @staticmethod
+    def _decode(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _claim_next(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(_NEXT_JOB).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, stage = NULL WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+            return self._decode(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _set_stage(self, job_id, stage):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def _finish(self, job_id, result=None, error=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    "failed" if error else "done",
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def purge_finished(self):
+        """Delete finished jobs older than the retention period, calling `on_purge(job)` for each."""
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            ).fetchall()
+            db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,))
+        for row in rows:
+            if self.on_purge:
+                self.on_purge(self._decode(row))
+        return len(rows)
+
+    def _work(self):
+        last_purge = 0.0
+        while True:
+            if time.time() - last_purge > 600:
+                last_purge = time.time()
+                try:
+                    self.purge_finished()
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning("Purging old jobs failed: %s", e)
+            try:
+                job = self._claim_next()
+            except sqlite3.Error as e:
+                logger.warning("Claiming a job failed: %s", e)
+                job = None
+            if job is None:
+                # Also wake up periodically in case another process queued work
+                with self._wakeup:
+                    self._wakeup.wait(timeout=2)
+                continue
+
+            logger.info("Job %s (%s for %s) started", job["id"], job["kind"], job["owner"])
+            try:
+                result = self.handlers[job["kind"]](
+                    job["id"], job["params"], lambda stage, job_id=job["id"]: self._set_stage(job_id, stage)
+                )
+            except Exception as e:
+                logger.warning("Job %s failed: %s", job["id"], e)
+                self._finish(job["id"], error=str(e))
+            else:
+                self._finish(job["id"], result=result)
+
+
+class _Transaction:
+    """Context manager closing a connection, committing or rolling back an explicit transaction."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
+        return False
@@ -0,0 +1,57 @@
+"""Incremental parsing of JSON arrays that arrive in pieces, e.g. from a streamed LLM response."""
+import json
+
+
+class JsonArrayStreamParser:
+    """
+    Extract the top-level objects of a JSON array from text fed in arbitrary chunks.
+
+    Anything before the opening bracket, such as a ```json fence, is ignored. Each object
+    is decoded with json.loads as soon as its closing brace arrives, so callers can act
+    on it before the rest of the array has been received.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._current = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text):
+        """Consume a chunk of text and return the list of objects it completed."""
+        completed = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                self.started = char == "["
+                continue
+            if self._depth == 0:
+                # Between elements: only an opening brace or the closing bracket matter
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                elif char == "]":
+                    self.finished = True
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads("".join(self._current)))
+                    self._current = []
+        return completed
@@ -0,0 +1,189 @@
+"""
+Range-capable HTTP endpoint serving finished episodes straight from disk.
+
+st.audio and st.download_button copy a file into Streamlit's in-memory media store (the
+download button reads it a second time), so every session showing an episode holds it in
+server memory. Serving the files from here instead streams them from disk in small
+chunks and answers the Range requests players use for seeking.
+
+A file with a `<name>.growing` marker next to it is still being written (see GrowingFile):
+it is streamed as it grows, like a radio stream, until the marker goes away.
+"""
+import functools
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Only episode outputs are exposed; scripts, uploads and job databases stay private
+SERVED_EXTENSIONS = {".mp3": "audio/mpeg", ".opus": "audio/ogg", ".vtt": "text/vtt", ".json": "application/json"}
+SERVED_JSON_NAMES = {"chapters.json"}
+_CHUNK_SIZE = 64 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+GROWING_SUFFIX = ".growing"
+_GROWING_POLL_SECONDS = 0.2
+# A growing file that stops growing for this long is treated as abandoned by its writer
+_GROWING_IDLE_SECONDS = 300
+
+
+def media_path(roots, url_path):
+    """Map "/<root name>/<relative path>" to a file under one of `roots`, or None."""
+    root_name, _, relative = urllib.parse.unquote(url_path).lstrip("/").partition("/")
+    root = roots.get(root_name)
+    if not root or not relative:
+        return None
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative))
+    extension = os.path.splitext(path)[1].lower()
+    if os.path.commonpath([root, path]) != root or extension not in SERVED_EXTENSIONS:
+        return None
+    if extension == ".json" and os.path.basename(path) not in SERVED_JSON_NAMES:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def media_url(base_url, roots, path):
+    """Return the URL serving `path` from `roots`, or None when it lies outside them."""
+    path = os.path.realpath(path)
+    for root_name, root in roots.items():
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, path]) == root:
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            return f"{base_url.rstrip('/')}/{root_name}/{urllib.parse.quote(relative)}"
+    return None
+
+
+class GrowingFile:
+    """
+    Binary file that listeners may stream from the media server while it is being written.
+
+    Use as a context manager: the marker exists from opening until the file is closed, and
+    every write is flushed so readers see it at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        with open(self.path + GROWING_SUFFIX, "w"):
+            pass
+        self._file = open(self.path, "wb")
+        return self
+
+    def write(self, data):
+        self._file.write(data)
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        os.unlink(self.path + GROWING_SUFFIX)
+        return False
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    roots = {}
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def serve(self, send_body):
+        url = urllib.parse.urlsplit(self.path)
+        path = media_path(self.roots, url.path)
+        if path is None:
+            self.send_error(404)
+            return
+        if os.path.exists(path + GROWING_SUFFIX):
+            self.serve_growing(path, send_body)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        match = _RANGE.match(self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", SERVED_EXTENSIONS[os.path.splitext(path)[1].lower()])
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        download_name = urllib.parse.parse_qs(url.query).get("download", [None])[0]
+        if download_name:
+            self.send_header(
+                "Content-Disposition", f"attachment; filename*=UTF-8''{urllib.parse.quote(download_name)}"
+            )
+        self.end_headers()
+        if not send_body:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Players routinely drop a connection when the user seeks
+                    return
+                remaining -= len(chunk)
+
+    def serve_growing(self, path, send_body):
+        """Stream a file that is still being written; without a Content-Length, closing the connection ends it."""
+        self.send_response(200)
+        self.send_header("Content-Type", SERVED_EXTENSIONS[os.path.splitext(path)[1].lower()])
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if not send_body:
+            return
+        with open(path, "rb") as f:
+            last_growth = time.monotonic()
+            while True:
+                # Checked before reading, so bytes written before the marker went away are still sent
+                finished = not os.path.exists(path + GROWING_SUFFIX)
+                chunk = f.read(_CHUNK_SIZE)
+                if chunk:
+                    try:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    last_growth = time.monotonic()
+                elif finished or time.monotonic() - last_growth > _GROWING_IDLE_SECONDS:
+                    return
+                else:
+                    time.sleep(_GROWING_POLL_SECONDS)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def start_media_server(port, roots):
+    """
+    Serve files under `roots` (a tuple of (name, directory) pairs) on `port` from a daemon thread.
+
+    A file is reachable as /<name>/<path relative to the directory>; repeated calls are no-ops.
+    """
+    handler = type("MediaHandler", (_MediaHandler,), {"roots": dict(roots)})
+    server = ThreadingHTTPServer(("0.0.0.0", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="media-server").start()
+    return server
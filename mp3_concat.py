@@ -0,0 +1,141 @@
+"""Frame-level MP3 concatenation that joins segments without decoding them."""
+import os
+import tempfile
+
+
+class Mp3FormatError(ValueError):
+    """Raised when segments cannot be joined frame by frame and need to be re-encoded."""
+
+
+# Layer III bitrates in kbps by bitrate index; MPEG-1 and MPEG-2/2.5 use different tables
+_BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5) and sample rate index
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_ID3V1_TAG_SIZE = 128
+
+
+def _parse_frame_header(data, pos):
+    """
+    Parse the Layer III frame header at `pos`.
+
+    Returns (frame_length, stream_format) where stream_format is a
+    (version, sample_rate, is_mono) tuple, or None if there is no valid header at `pos`.
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    padding = (data[pos + 2] >> 1) & 0x01
+    is_mono = (data[pos + 3] >> 6) == 3
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    bitrate = (_BITRATES_MPEG1 if version == 3 else _BITRATES_MPEG2)[bitrate_index] * 1000
+    coefficient = 144 if version == 3 else 72
+    return coefficient * bitrate // sample_rate + padding, (version, sample_rate, is_mono)
+
+
+def _id3v2_size(data):
+    """Return the size of a leading ID3v2 tag, or 0 if there is none."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_vbr_header_frame(frame, stream_format):
+    """Return True for Xing/Info/VBRI frames, which describe a single file and carry no audio."""
+    version, _, is_mono = stream_format
+    offset = 4 if frame[1] & 0x01 else 6
+    if version == 3:
+        offset += 17 if is_mono else 32
+    else:
+        offset += 9 if is_mono else 17
+    return frame[offset:offset + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+def iter_mp3_frames(data):
+    """
+    Yield (frame, stream_format) for every audio frame in an MP3 byte string.
+
+    ID3v2/ID3v1 tags and Xing/Info header frames are skipped, and junk between frames
+    is skipped by resynchronizing on the next valid header. A truncated final frame is dropped.
+    """
+    data = memoryview(data)
+    pos = _id3v2_size(data)
+    while pos + 4 <= len(data):
+        header = _parse_frame_header(data, pos)
+        if header is None:
+            if data[pos:pos + 3] == b"TAG" and len(data) - pos == _ID3V1_TAG_SIZE:
+                break
+            pos += 1
+            continue
+        frame_length, stream_format = header
+        if pos + frame_length > len(data):
+            break
+        frame = data[pos:pos + frame_length]
+        if not _is_vbr_header_frame(frame, stream_format):
+            yield frame, stream_format
+        pos += frame_length
+
+
+def mp3_duration(path):
+    """Return the duration of an MP3 file in seconds, from its frame headers."""
+    with open(path, "rb") as f:
+        data = f.read()
+    duration = 0.0
+    for _, (version, sample_rate, _) in iter_mp3_frames(data):
+        # Layer III frames hold 1152 samples in MPEG-1 and 576 in MPEG-2/2.5
+        duration += (1152 if version == 3 else 576) / sample_rate
+    return duration
+
+
+def append_mp3_frames(file_path, output, expected_format=None):
+    """
+    Copy the audio frames of the MP3 file at `file_path` to the binary file object `output`.
+
+    Returns the segment's stream format. Raises Mp3FormatError if it holds no Layer III
+    frames or its format differs from `expected_format`.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    frame_count = 0
+    for frame, stream_format in iter_mp3_frames(data):
+        if expected_format is None:
+            expected_format = stream_format
+        elif stream_format != expected_format:
+            raise Mp3FormatError(
+                f"{file_path} 的音频格式 {stream_format} 与之前的片段 {expected_format} 不一致"
+            )
+        output.write(frame)
+        frame_count += 1
+    if frame_count == 0:
+        raise Mp3FormatError(f"{file_path} 中没有可识别的 MP3 音频帧")
+    return expected_format
+
+
+def concatenate_mp3_frames(audio_files_paths, output_path):
+    """
+    Join MP3 segments into `output_path` by copying their frames, without decoding.
+
+    Only one segment is held in memory at a time, so memory use does not grow with the
+    length of the episode. Raises Mp3FormatError if a segment holds no Layer III frames
+    or its MPEG version, sample rate or channel count differs from the first segment.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix=".mp3.tmp")
+    expected_format = None
+    try:
+        with os.fdopen(fd, "wb") as output:
+            for file_path in audio_files_paths:
+                expected_format = append_mp3_frames(file_path, output, expected_format)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return output_path
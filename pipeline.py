@@ -0,0 +1,1167 @@
+"""
+Headless podcast generation pipeline: extraction, recommendation, dialogue, TTS and concatenation.
+
+Nothing here depends on Streamlit, so the same functions back the web app (app.py) and the
+batch CLI (batch.py). Failures are raised as PodcastError with a user-facing message.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+from artifacts import ArtifactStore
+from audio_assembly import AudioAssemblyError, assemble_segments
+from cache import DiskCache, make_cache_key
+from chunking import estimate_tokens, split_into_chunks, truncate_to_tokens
+from compaction import compact_text
+from episode_output import Chapter, EpisodeOutputError, build_chapters, encode_opus, package_hls, write_chapters
+from jobs import JobQueue
+from json_stream import JsonArrayStreamParser
+from mp3_concat import Mp3FormatError, concatenate_mp3_frames, mp3_duration
+from telemetry import current_span, record_llm_usage, span, traced
+from text_extraction import SUPPORTED_EXTENSIONS, iter_document_text
+from tts_planner import plan_tts_requests
+from transport import (
+    HTTP_MAX_RETRIES, AdaptiveConcurrencyLimiter, backoff_delay, get_openai_client, iter_sse_data, post_with_retry
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration & Constants ---
+OPENAI_API_KEY = os.getenv("GEMINI_API_KEY")
+OPENAI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/")
+MINIMAX_GROUP_ID = os.getenv("MINIMAX_GROUP_ID")
+MINIMAX_API_KEY = os.getenv("MINIMAX_API_KEY")
+
+VOICE_OPTIONS = {
+    "青涩青年音色": "male-qn-qingse", "精英青年音色": "male-qn-jingying", "霸道青年音色": "male-qn-badao",
+    "青年大学生音色": "male-qn-daxuesheng", "少女音色": "female-shaonv", "御姐音色": "female-yujie",
+    "成熟女性音色": "female-chengshu", "甜美女性音色": "female-tianmei", "男性主持人": "presenter_male",
+    "女性主持人": "presenter_female", "男性有声书1": "audiobook_male_1", "男性有声书2": "audiobook_male_2",
+    "女性有声书1": "audiobook_female_1", "女性有声书2": "audiobook_female_2",
+    "青涩青年音色-beta": "male-qn-qingse-jingpin", "精英青年音色-beta": "male-qn-jingying-jingpin",
+    "霸道青年音色-beta": "male-qn-badao-jingpin", "青年大学生音色-beta": "male-qn-daxuesheng-jingpin",
+    "少女音色-beta": "female-shaonv-jingpin", "御姐音色-beta": "female-yujie-jingpin",
+    "成熟女性音色-beta": "female-chengshu-jingpin", "甜美女性音色-beta": "female-tianmei-jingpin",
+    "聪明男童": "clever_boy", "可爱男童": "cute_boy", "萌萌女童": "lovely_girl", "卡通猪小琪": "cartoon_pig",
+    "病娇弟弟": "bingjiao_didi", "俊朗男友": "junlang_nanyou", "纯真学弟": "chunzhen_xuedi",
+    "冷淡学长": "lengdan_xiongzhang", "霸道少爷": "badao_shaoye", "甜心小玲": "tianxin_xiaoling",
+    "俏皮萌妹": "qiaopi_mengmei", "妩媚御姐": "wumei_yujie", "嗲嗲学妹": "diadia_xuemei",
+    "淡雅学姐": "danya_xuejie"
+}
+
+DIALOGUE_STYLES = {
+    "轻松幽默": "以轻松、幽默的方式进行对话，加入适当的笑话和轻松的语气。",
+    "专业深入": "以专业、深入的方式探讨主题，注重细节和逻辑分析。",
+    "生动叙事": "以故事化、形象化的方式叙述，增强听众的沉浸感。",
+    "激烈争辩": "以对立、争辩的风格展开对话，突出不同观点的碰撞。",
+    "温暖治愈": "用温柔、暖心的语言传递情感，注重共情与安抚，适合分享心事、给予鼓励的场景。",
+    "简洁干练": "语言直截了当、聚焦核心信息，适合快速沟通、传达指令或高效解决问题的场景。",
+    "文艺诗意": "运用优美修辞与意象化表达，营造浪漫或哲思氛围，适合文学交流、情感抒发的场景。",
+    "萌系软萌": "用俏皮可爱的语气和词汇，搭配撒娇或萌系表达，适合轻松娱乐、互动调侃的场景。",
+    "悬疑探秘": "用神秘悬疑的语调设置悬念，引导好奇，适合故事讲述、推理讨论或剧情分析的场景。",
+    "励志燃情": "充满激情与力量感，用短句、排比激发斗志，适合演讲、激励他人或自我打气的场景。",
+    "吐槽犀利": "用幽默讽刺、一针见血的语言点评现象，带点毒舌趣味，适合调侃热点、分享观点的场景。"
+}
+
+MINIMAX_API_URL_TEMPLATE = os.getenv(
+    "MINIMAX_API_URL_TEMPLATE", "https://api.minimax.chat/v1/t2a_v2?GroupId={group_id}"
+)
+# Stream TTS responses and write audio to disk as it arrives instead of buffering each line
+TTS_STREAMING = os.getenv("TTS_STREAMING", "0") == "1"
+# Maximum number of Minimax requests in flight at once, shared by all sessions in the process;
+# the effective limit adapts downwards when Minimax starts rate limiting
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
+# Optional cap on Minimax requests per minute across the whole process (0 = no cap)
+TTS_RATE_LIMIT_PER_MINUTE = int(os.getenv("TTS_RATE_LIMIT_PER_MINUTE", "0"))
+# Consecutive same-voice lines are merged into one request up to this many characters, and
+# longer lines are split into parallel requests at sentence boundaries
+TTS_MAX_REQUEST_CHARS = int(os.getenv("TTS_MAX_REQUEST_CHARS", "300"))
+# Characters each app session may spend on synthesizing scripts before they are accepted
+SPECULATIVE_TTS_MAX_CHARS = int(os.getenv("SPECULATIVE_TTS_MAX_CHARS", "10000"))
+
+MINIMAX_TTS_MODEL = "speech-02-turbo"
+MINIMAX_VOICE_SETTING = {
+    "voice_id": "",
+    "speed": 1.0,
+    "pitch": 0,
+    "vol": 1.0,
+    "latex_read": False
+}
+MINIMAX_AUDIO_SETTING = {
+    "sample_rate": 32000,
+    "bitrate": 128000,
+    "format": "mp3"
+}
+
+# Content longer than the budget is condensed chunk by chunk (in parallel) before prompting
+CONTENT_TOKEN_BUDGET = int(os.getenv("CONTENT_TOKEN_BUDGET", "30000"))
+CHUNK_TOKEN_SIZE = int(os.getenv("CHUNK_TOKEN_SIZE", "8000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+
+# LLM responses are cached on disk; bump a prompt version whenever its template changes
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "podcast_llm_cache"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DIALOGUE_PROMPT_VERSION = 1
+RECOMMEND_PROMPT_VERSION = 1
+SUMMARY_PROMPT_VERSION = 1
+
+# Synthesized segments are cached on disk, keyed by everything that affects the audio
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "podcast_tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Per-session working files of the web app (segments, episodes), cleaned up in the background
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "podcast_artifacts"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+ARTIFACT_SESSION_QUOTA_BYTES = int(os.getenv("ARTIFACT_SESSION_QUOTA_BYTES", str(200 * 1024 * 1024)))
+ARTIFACT_MAX_AGE_SECONDS = int(os.getenv("ARTIFACT_MAX_AGE_SECONDS", str(6 * 3600)))
+ARTIFACT_GC_INTERVAL_SECONDS = int(os.getenv("ARTIFACT_GC_INTERVAL_SECONDS", "300"))
+
+# Background episode jobs (SQLite queue + per-job folders), shared by all sessions of the process
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "podcast_jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+DEFAULT_RECOMMENDATIONS = {
+    "characters": [
+        {"name": "Alice", "voice": "少女音色"},
+        {"name": "Bob", "voice": "青涩青年音色"}
+    ],
+    "dialogue_style": "轻松幽默"
+}
+
+
+class PodcastError(Exception):
+    """Raised when a pipeline stage fails; the message is meant to be shown to the user."""
+
+
+# --- Helper Functions ---
+@functools.lru_cache(maxsize=None)
+def get_tts_cache():
+    """Return the process-wide cache of synthesized speech segments."""
+    return DiskCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, suffix=".mp3")
+
+@functools.lru_cache(maxsize=None)
+def get_llm_cache():
+    """Return the process-wide cache of LLM responses."""
+    return DiskCache(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, suffix=".json", ttl_seconds=LLM_CACHE_TTL_SECONDS)
+
+@functools.lru_cache(maxsize=None)
+def get_artifact_store():
+    """Return the process-wide artifact store, starting its background cleanup on first use."""
+    store = ArtifactStore(
+        ARTIFACT_DIR, ARTIFACT_MAX_BYTES, ARTIFACT_SESSION_QUOTA_BYTES, ARTIFACT_MAX_AGE_SECONDS
+    )
+    store.start_background_gc(ARTIFACT_GC_INTERVAL_SECONDS)
+    return store
+
+@functools.lru_cache(maxsize=None)
+def get_minimax_limiter():
+    """Return the process-wide adaptive concurrency limiter for Minimax requests."""
+    return AdaptiveConcurrencyLimiter(TTS_MAX_CONCURRENCY, rate_per_minute=TTS_RATE_LIMIT_PER_MINUTE)
+
+def _minimax_rate_limited(response):
+    """Minimax reports rate limiting as base_resp.status_code 1002 inside an HTTP 200 response."""
+    if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+        # Reading an event stream here would consume the audio; in-stream errors are checked per event
+        return False
+    try:
+        return response.json().get("base_resp", {}).get("status_code") == 1002
+    except ValueError:
+        return False
+
+def content_hash(content):
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def load_cached_llm_response(llm_cache, cache_key):
+    """Return the decoded cached response for `cache_key`, or None on a miss."""
+    cached = llm_cache.get(cache_key)
+    return json.loads(cached) if cached else None
+
+def store_llm_response(llm_cache, cache_key, value):
+    """Cache a JSON-serializable LLM response; failures to write are ignored."""
+    try:
+        llm_cache.put(cache_key, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    except OSError:
+        pass
+
+def strip_json_fence(text):
+    """Remove the ```json fence models like to wrap JSON output in."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def is_valid_dialogue(dialogue):
+    """Return True if `dialogue` is a list of {"speaker", "line"} objects."""
+    return isinstance(dialogue, list) and all(
+        isinstance(item, dict) and "speaker" in item and "line" in item for item in dialogue
+    )
+
+def sanitize_filename(filename):
+    """
+    Sanitize a filename to prevent encoding issues:
+    1. Normalize Unicode characters
+    2. Replace spaces with underscores
+    3. Remove characters that might cause issues
+    4. Ensure the filename has a valid extension
+    """
+    # Normalize unicode characters
+    clean_name = unicodedata.normalize('NFKD', filename)
+    # Replace spaces and remove problematic characters
+    clean_name = re.sub(r'[^\w\s.-]', '', clean_name).replace(' ', '_')
+
+    # Ensure we keep the original extension
+    original_ext = os.path.splitext(filename)[1].lower()
+    if original_ext in SUPPORTED_EXTENSIONS:
+        # Make sure the extension is preserved correctly
+        base = os.path.splitext(clean_name)[0]
+        clean_name = f"{base}{original_ext}"
+
+    return clean_name
+
+@traced("extract")
+def extract_text_from_file(filename, data, on_progress=None):
+    """
+    Extract text from the contents of a .txt, .pdf or .docx file.
+
+    `on_progress(extracted_chars)` is called as pieces of the document are extracted.
+    """
+    # Sanitize the filename
+    original_filename = sanitize_filename(filename)
+    file_extension = os.path.splitext(original_filename)[1].lower()
+
+    # Check if extension is supported
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise PodcastError("不支持的文件类型。请上传 .txt, .pdf 或 .docx 文件")
+
+    try:
+        # Collect the pieces as they are extracted, reporting progress along the way
+        text_pieces = []
+        extracted_chars = 0
+        for piece in iter_document_text(file_extension, data):
+            text_pieces.append(piece)
+            extracted_chars += len(piece)
+            if on_progress:
+                on_progress(extracted_chars)
+        text = "".join(text_pieces)
+    except Exception as e:
+        raise PodcastError(f"处理文件时出错：{e}") from e
+
+    current_span().set("bytes_in", len(data))
+    current_span().set("chars", len(text))
+    # Check if text is empty or invalid
+    if not text.strip():
+        raise PodcastError("从文件中提取的文本为空或无效。")
+    return text
+
+@traced("compact")
+def compact_content(content):
+    """
+    Strip page furniture, hyphenation and whitespace noise from extracted text before prompting.
+
+    Returns a CompactionResult; its text replaces the content everywhere it is sent to the LLM.
+    """
+    result = compact_text(content)
+    current_span().set("chars_saved", result.chars_before - result.chars_after)
+    current_span().set("tokens_saved", result.tokens_before - result.tokens_after)
+    return result
+
+@traced("summarize")
+def summarize_chunk(client, llm_cache, chunk, max_tokens, model="gemini-2.0-flash"):
+    """Extract the key points of one chunk of a long document."""
+    cache_key = make_cache_key(
+        "summary", SUMMARY_PROMPT_VERSION, model, 0.3, content_hash(chunk), {"max_tokens": max_tokens}
+    )
+    cached_summary = load_cached_llm_response(llm_cache, cache_key)
+    current_span().set("cache_hit", bool(cached_summary))
+    if cached_summary:
+        return cached_summary
+    prompt = f"""
+    以下是一份长文档中的一个片段。请提取其中的核心观点、关键事实、数据和案例，
+    以简洁的要点形式输出，保留原文中的专有名词和数字，总长度不超过 {max_tokens} 字。
+    只输出要点，不要包含任何其他说明。
+
+    片段：
+    ---
+    {chunk}
+    ---
+    """
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "你是一个擅长提炼长文档要点的编辑。"},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+    )
+    record_llm_usage(response)
+    summary = response.choices[0].message.content.strip()
+    store_llm_response(llm_cache, cache_key, summary)
+    return summary
+
+def condense_content(content, token_budget=CONTENT_TOKEN_BUDGET, model="gemini-2.0-flash"):
+    """
+    Reduce long content to roughly `token_budget` tokens with a parallel map-reduce.
+
+    The content is split at page/paragraph boundaries, every chunk is summarized
+    concurrently, and the joined key points are reduced again until they fit the budget.
+    Content that already fits is returned unchanged.
+    """
+    if estimate_tokens(content) <= token_budget:
+        return content
+
+    client = get_openai_client(OPENAI_API_KEY, OPENAI_BASE_URL)
+    llm_cache = get_llm_cache()
+    try:
+        while estimate_tokens(content) > token_budget:
+            chunks = split_into_chunks(content, CHUNK_TOKEN_SIZE)
+            tokens_per_chunk = max(token_budget // len(chunks), 200)
+            with ThreadPoolExecutor(max_workers=min(SUMMARY_MAX_CONCURRENCY, len(chunks))) as executor:
+                summaries = list(executor.map(
+                    lambda chunk: summarize_chunk(client, llm_cache, chunk, tokens_per_chunk, model), chunks
+                ))
+            reduced = "\n\n".join(summaries)
+            if estimate_tokens(reduced) >= estimate_tokens(content):
+                break
+            content = reduced
+    except Exception as e:
+        logger.warning("提炼长文档要点时出错，将截断内容后继续：%s", e)
+
+    # Truncate whatever still exceeds the budget
+    return truncate_to_tokens(content, token_budget)
+
+def build_dialogue_prompt(content, char1_name, char2_name, dialogue_style):
+    """Build the user prompt asking the model for a two-character podcast dialogue."""
+    style_instruction = DIALOGUE_STYLES[dialogue_style]
+    return f"""
+    根据以下内容，为两个角色（{char1_name} 和 {char2_name}）生成一段引人入胜的播客对话。
+    对话应以{style_instruction}的方式，深入探讨内容的主题和信息，可以适当展开话题，以对话形式呈现,可适当增加一些口语，增加真实性。
+    基础分析结构
+    简明概述：以简单术语解释核心概念
+    重要案例研究：历史与现代应用实例
+    当前实践方法：科学有效性与方法论
+    未来影响：预测发展方向与应用可能
+    分析方法（费曼技巧）
+    将复杂概念简化为通俗易懂的解释
+    识别知识盲点并深入研究
+    通过类比和实例连接相关概念
+    为每个发现提供实际应用案例
+    设计引导思考的练习问题
+    建立清晰的心智模型
+    每个关键点用3句话总结
+    战略思维框架
+    预测分析：探究不同背景下的多种方法与基本假设
+    监控观察：识别模式并与最佳实践比较
+    选择应用：从熟悉案例过渡到创新框架
+    顺序安排：策略性地构建学习路径
+    联系整合：通过分解、测试和迭代，将表面差异与核心原则连接起来
+    文字里不要包含动作或者表情细节，因为播客是文字形式。最多15轮对话。
+    输出格式为 JSON 列表，每个对象包含 "speaker" 键（值为 "{char1_name}" 或 "{char2_name}"）和 "line" 键（角色所说的话）。
+    不要在 JSON 列表之外包含任何其他文本或说明。
+
+    内容：
+    ---
+    {content}
+    ---
+
+    JSON 输出：
+    """
+
+def dialogue_cache_key(content, char1_name, char2_name, dialogue_style, model):
+    """Return the LLM cache key for a dialogue script request."""
+    return make_cache_key(
+        "dialogue", DIALOGUE_PROMPT_VERSION, model, 0.7, content_hash(content),
+        {"char1_name": char1_name, "char2_name": char2_name, "dialogue_style": dialogue_style}
+    )
+
+@traced("dialogue")
+def generate_dialogue_openai(content, char1_name, char2_name, dialogue_style, model="gemini-2.0-flash", force_refresh=False):
+    """Generate dialogue using OpenAI API; identical requests are served from the LLM cache unless `force_refresh`."""
+    llm_cache = get_llm_cache()
+    cache_key = dialogue_cache_key(content, char1_name, char2_name, dialogue_style, model)
+    if not force_refresh:
+        cached_dialogue = load_cached_llm_response(llm_cache, cache_key)
+        current_span().set("cache_hit", bool(cached_dialogue))
+        if cached_dialogue:
+            return cached_dialogue
+
+    client = get_openai_client(OPENAI_API_KEY, OPENAI_BASE_URL)
+    prompt = build_dialogue_prompt(content, char1_name, char2_name, dialogue_style)
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是一个富有创意的播客脚本作者。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+        )
+    except Exception as e:
+        raise PodcastError(f"使用 OpenAI 生成对话时出错：{e}") from e
+    record_llm_usage(response)
+
+    dialogue_json_str = strip_json_fence(response.choices[0].message.content)
+    try:
+        dialogue = json.loads(dialogue_json_str)
+    except json.JSONDecodeError as e:
+        raise PodcastError(f"无法解析 AI 响应为 JSON。原始输出：{dialogue_json_str}") from e
+    if not is_valid_dialogue(dialogue):
+        raise PodcastError(f"AI 返回的对话格式不正确。原始输出：{dialogue_json_str}")
+    store_llm_response(llm_cache, cache_key, dialogue)
+    return dialogue
+
+def generate_dialogue_openai_stream(content, char1_name, char2_name, dialogue_style, model="gemini-2.0-flash", force_refresh=False):
+    """
+    Stream dialogue generation and yield each turn as soon as the model finishes writing it.
+
+    The completion is parsed incrementally, so callers can start working on the first turns
+    (e.g. speech synthesis) while the rest of the script is still being generated. A cached
+    script for the same request is replayed instead unless `force_refresh`. Raises
+    PodcastError, possibly after some turns were yielded, if the output is malformed.
+    """
+    # @traced would only time creating the generator, so the span is opened in here
+    with span("dialogue", streaming=True) as dialogue_span:
+        yield from _stream_dialogue(
+            dialogue_span, content, char1_name, char2_name, dialogue_style, model, force_refresh
+        )
+
+def _stream_dialogue(dialogue_span, content, char1_name, char2_name, dialogue_style, model, force_refresh):
+    llm_cache = get_llm_cache()
+    cache_key = dialogue_cache_key(content, char1_name, char2_name, dialogue_style, model)
+    if not force_refresh:
+        cached_dialogue = load_cached_llm_response(llm_cache, cache_key)
+        dialogue_span.set("cache_hit", bool(cached_dialogue))
+        if cached_dialogue:
+            yield from cached_dialogue
+            return
+
+    turns = []
+    client = get_openai_client(OPENAI_API_KEY, OPENAI_BASE_URL)
+    prompt = build_dialogue_prompt(content, char1_name, char2_name, dialogue_style)
+    parser = JsonArrayStreamParser()
+    raw_output = []
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是一个富有创意的播客脚本作者。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in response:
+            # Token usage arrives in a final chunk without choices, after the script itself
+            if getattr(chunk, "usage", None):
+                dialogue_span.add("prompt_tokens", chunk.usage.prompt_tokens or 0)
+                dialogue_span.add("completion_tokens", chunk.usage.completion_tokens or 0)
+            if parser.finished or not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            raw_output.append(chunk.choices[0].delta.content)
+            for item in parser.feed(chunk.choices[0].delta.content):
+                if not is_valid_dialogue([item]):
+                    raise PodcastError(f"AI 返回的对话格式不正确。原始输出：{''.join(raw_output)}")
+                turns.append(item)
+                if len(turns) == 1:
+                    dialogue_span.set("first_turn_seconds", round(dialogue_span.elapsed(), 3))
+                yield item
+    except json.JSONDecodeError as e:
+        raise PodcastError(f"无法解析 AI 响应为 JSON。原始输出：{''.join(raw_output)}") from e
+    except PodcastError:
+        raise
+    except Exception as e:
+        raise PodcastError(f"使用 OpenAI 生成对话时出错：{e}") from e
+
+    if not parser.finished:
+        raise PodcastError(f"无法解析 AI 响应为 JSON。原始输出：{''.join(raw_output)}")
+    store_llm_response(llm_cache, cache_key, turns)
+
+@traced("recommend")
+def recommend_characters_and_voices(content, model="gemini-2.0-flash", force_refresh=False):
+    """
+    Analyze content and recommend character names, voices, and dialogue style using OpenAI.
+
+    Raises PodcastError if the model fails or returns an unusable recommendation; callers
+    usually fall back to DEFAULT_RECOMMENDATIONS.
+    """
+    llm_cache = get_llm_cache()
+    cache_key = make_cache_key("recommend", RECOMMEND_PROMPT_VERSION, model, 0.7, content_hash(content), {})
+    if not force_refresh:
+        cached_recommendations = load_cached_llm_response(llm_cache, cache_key)
+        current_span().set("cache_hit", bool(cached_recommendations))
+        if cached_recommendations:
+            return cached_recommendations
+
+    client = get_openai_client(OPENAI_API_KEY, OPENAI_BASE_URL)
+    prompt = f"""
+    根据以下内容，推荐两个适合进行播客对话的角色名字（例如，名字应反映内容主题或角色背景），
+    每个角色的音色（从以下音色列表中选择：{', '.join(VOICE_OPTIONS.keys())}），
+    以及一个适合内容的对话风格（从以下风格中选择：{', '.join(DIALOGUE_STYLES.keys())}）。
+    输出 JSON 格式，包含两个角色，每个角色有 "name" 和 "voice" 键，以及一个 "dialogue_style" 键表示推荐的对话风格。
+
+    内容：
+    ---
+    {content}
+    ---
+
+    JSON 输出：
+    {{
+        "characters": [
+            {{"name": "角色1名字", "voice": "音色名称"}},
+            {{"name": "角色2名字", "voice": "音色名称"}}
+        ],
+        "dialogue_style": "对话风格名称"
+    }}
+    """
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是一个擅长分析文本并推荐播客角色和对话风格的 AI。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+        )
+        record_llm_usage(response)
+        response_json_str = strip_json_fence(response.choices[0].message.content)
+        recommendations = json.loads(response_json_str)
+    except Exception as e:
+        raise PodcastError(f"推荐角色和对话风格时出错：{e}") from e
+
+    if (
+        not isinstance(recommendations, dict) or
+        "characters" not in recommendations or
+        "dialogue_style" not in recommendations or
+        not isinstance(recommendations["characters"], list) or
+        len(recommendations["characters"]) != 2 or
+        not all(
+            isinstance(item, dict) and "name" in item and "voice" in item and item["voice"] in VOICE_OPTIONS
+            for item in recommendations["characters"]
+        ) or
+        recommendations["dialogue_style"] not in DIALOGUE_STYLES
+    ):
+        raise PodcastError(f"AI 推荐的格式不正确。原始输出：{response_json_str}")
+    store_llm_response(llm_cache, cache_key, recommendations)
+    return recommendations
+
+def tts_cache_key(text_to_speak, voice_id):
+    """Return the segment cache key covering everything that affects the synthesized audio."""
+    return make_cache_key(
+        text_to_speak, voice_id, MINIMAX_TTS_MODEL, MINIMAX_VOICE_SETTING, MINIMAX_AUDIO_SETTING
+    )
+
+def _minimax_request(text_to_speak, voice_id):
+    """Return the (url, headers, payload) of a Minimax t2a_v2 request."""
+    url = MINIMAX_API_URL_TEMPLATE.format(group_id=MINIMAX_GROUP_ID)
+    headers = {
+        "Authorization": f"Bearer {MINIMAX_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": MINIMAX_TTS_MODEL,
+        "text": text_to_speak,
+        "timber_weights": [
+            {
+                "voice_id": voice_id,
+                "weight": 100
+            }
+        ],
+        "voice_setting": MINIMAX_VOICE_SETTING,
+        "audio_setting": MINIMAX_AUDIO_SETTING,
+        "language_boost": "auto"
+    }
+    return url, headers, payload
+
+@traced("tts")
+def text_to_speech_minimax(text_to_speak, voice_id):
+    """Generate speech using Minimax API and return audio content."""
+    tts_cache = get_tts_cache()
+    cache_key = tts_cache_key(text_to_speak, voice_id)
+    cached_audio = tts_cache.get(cache_key)
+    span = current_span()
+    span.set("cache_hit", bool(cached_audio))
+    span.set("bytes_in", len(text_to_speak.encode("utf-8")))
+    if cached_audio:
+        span.set("bytes_out", len(cached_audio))
+        return cached_audio
+
+    url, headers, payload = _minimax_request(text_to_speak, voice_id)
+    try:
+        response = post_with_retry(
+            url,
+            limiter=get_minimax_limiter(),
+            is_throttled=_minimax_rate_limited,
+            headers=headers,
+            json=payload,
+            timeout=60,
+        )
+        # post_with_retry hands back the last throttled response once its retries are used up
+        if response.status_code == 429 or _minimax_rate_limited(response):
+            raise PodcastError(f"Minimax API 限流，重试 {HTTP_MAX_RETRIES} 次后仍未成功")
+        response.raise_for_status()
+        parsed_json = response.json()
+    except requests.exceptions.RequestException as e:
+        raise PodcastError(f"调用 Minimax API 时出错：{e}") from e
+    except json.JSONDecodeError as e:
+        raise PodcastError(f"无法解析 Minimax API 响应为 JSON：{response.text}") from e
+
+    # Error responses carry "data": null and the reason in base_resp
+    data = parsed_json.get("data") or {}
+    if not data.get("audio"):
+        status_msg = (parsed_json.get("base_resp") or {}).get("status_msg")
+        if status_msg:
+            raise PodcastError(f"Minimax API 返回错误：{status_msg}")
+        raise PodcastError(f"Minimax API 未返回音频数据。响应：{response.text}")
+
+    try:
+        audio_content = bytes.fromhex(data["audio"])
+    except ValueError as e:
+        raise PodcastError(f"无法将音频数据从十六进制解码：{e}") from e
+    span.set("bytes_out", len(audio_content))
+    try:
+        tts_cache.put(cache_key, audio_content)
+    except OSError:
+        pass
+    return audio_content
+
+class HexStreamDecoder:
+    """Decode hex text that arrives in pieces, carrying an odd trailing digit over to the next piece."""
+
+    def __init__(self):
+        self._pending = ""
+
+    def decode(self, hex_text):
+        hex_text = self._pending + hex_text
+        even_length = len(hex_text) - len(hex_text) % 2
+        self._pending = hex_text[even_length:]
+        return bytes.fromhex(hex_text[:even_length])
+
+    def finish(self):
+        if self._pending:
+            raise ValueError("音频数据的十六进制位数不完整")
+
+@traced("tts")
+def text_to_speech_minimax_stream(text_to_speak, voice_id, output_path, on_chunk=None):
+    """
+    Generate speech with Minimax's streaming mode, writing audio to `output_path` as it arrives.
+
+    Each server-sent event's hex audio is decoded on its own and appended to the file, so
+    peak memory is one event rather than the whole line, and `on_chunk(audio_bytes)` sees
+    the first audio long before the line is finished. The completed segment is cached like
+    text_to_speech_minimax. Throttling is retried whether Minimax reports it as a JSON body
+    or as an event, the latter only while no audio has been passed to `on_chunk`. Returns
+    `output_path`.
+    """
+    tts_cache = get_tts_cache()
+    cache_key = tts_cache_key(text_to_speak, voice_id)
+    cached_audio = tts_cache.get(cache_key)
+    span = current_span()
+    span.set("streaming", True)
+    span.set("cache_hit", bool(cached_audio))
+    span.set("bytes_in", len(text_to_speak.encode("utf-8")))
+    if cached_audio:
+        span.set("bytes_out", len(cached_audio))
+        with open(output_path, "wb") as f:
+            f.write(cached_audio)
+        if on_chunk:
+            on_chunk(cached_audio)
+        return output_path
+
+    url, headers, payload = _minimax_request(text_to_speak, voice_id)
+    payload["stream"] = True
+    limiter = get_minimax_limiter()
+    partial_path = output_path + ".part"
+    first_chunk = True
+    try:
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            decoder = HexStreamDecoder()
+            throttled = False
+            with post_with_retry(
+                url, limiter=limiter, is_throttled=_minimax_rate_limited,
+                headers=headers, json=payload, timeout=60, stream=True,
+            ) as response:
+                response.raise_for_status()
+                if response.headers.get("Content-Type", "").startswith("application/json"):
+                    # Errors are returned as a plain JSON body instead of an event stream
+                    if _minimax_rate_limited(response):
+                        raise PodcastError(f"Minimax API 限流，重试 {HTTP_MAX_RETRIES} 次后仍未成功")
+                    raise PodcastError(f"Minimax API 未返回音频数据。响应：{response.text}")
+                with open(partial_path, "wb") as f:
+                    for event in iter_sse_data(response):
+                        base_resp = event.get("base_resp") or {}
+                        # A throttled stream is only retried while none of its audio has been handed out
+                        if base_resp.get("status_code") == 1002 and (first_chunk or not on_chunk):
+                            throttled = True
+                            break
+                        if base_resp.get("status_code"):
+                            raise PodcastError(f"Minimax API 返回错误：{base_resp.get('status_msg')}")
+                        data = event.get("data") or {}
+                        # The final event (status 2) repeats the complete audio; everything was already written
+                        if data.get("status") == 2:
+                            break
+                        audio_chunk = decoder.decode(data.get("audio") or "")
+                        if audio_chunk:
+                            if first_chunk:
+                                span.set("first_audio_seconds", round(span.elapsed(), 3))
+                                first_chunk = False
+                            span.add("bytes_out", len(audio_chunk))
+                            f.write(audio_chunk)
+                            if on_chunk:
+                                on_chunk(audio_chunk)
+            if not throttled:
+                decoder.finish()
+                break
+            limiter.on_throttle()
+            if attempt == HTTP_MAX_RETRIES:
+                raise PodcastError(f"Minimax API 限流，重试 {HTTP_MAX_RETRIES} 次后仍未成功")
+            span.add("retries")
+            time.sleep(backoff_delay(attempt))
+        os.replace(partial_path, output_path)
+    except requests.exceptions.RequestException as e:
+        raise PodcastError(f"调用 Minimax API 时出错：{e}") from e
+    except json.JSONDecodeError as e:
+        raise PodcastError(f"无法解析 Minimax API 流式响应：{e}") from e
+    except ValueError as e:
+        raise PodcastError(f"无法将音频数据从十六进制解码：{e}") from e
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+    try:
+        tts_cache.put_file(cache_key, output_path)
+    except OSError:
+        pass
+    return output_path
+
+def link_or_copy(source_path, target_path):
+    """Hard-link `source_path` to `target_path`, copying instead where links are not possible."""
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        return
+    if os.path.exists(target_path):
+        os.unlink(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+def synthesize_lines_concurrently(lines, output_dir, max_in_flight=TTS_MAX_CONCURRENCY, on_line_done=None, streaming=TTS_STREAMING, reuse_segments=None):
+    """
+    Synthesize dialogue lines with bounded concurrency.
+
+    `lines` is an iterable of (line_number, text, voice_id) tuples; it is consumed lazily, so
+    at most `max_in_flight` requests are outstanding at any time. Each line is written to
+    `line_{line_number}.mp3` in `output_dir`. Returns a list of (line_number, path, error) in
+    the order the lines were given; for lines that failed, path is None and error holds the
+    reason. `on_line_done(line_number, path, error)` is called from the calling thread as
+    each line finishes. With `streaming`, lines use Minimax's streaming mode and are written
+    to disk as their audio arrives.
+
+    `reuse_segments` maps tts_cache_key(text, voice_id) to segment files from an earlier
+    run (see synthesized_segments); lines found there are linked into `output_dir` instead
+    of being synthesized again.
+    """
+    max_in_flight = max(1, max_in_flight)
+
+    def synthesize(line_number, text, voice_id):
+        audio_path = os.path.join(output_dir, f"line_{line_number}.mp3")
+        previous_path = reuse_segments.get(tts_cache_key(text, voice_id)) if reuse_segments else None
+        if previous_path and os.path.exists(previous_path):
+            try:
+                link_or_copy(previous_path, audio_path)
+                return audio_path
+            except OSError:
+                logger.warning("无法复用第 %s 行的音频，将重新合成", line_number)
+        if streaming:
+            try:
+                return text_to_speech_minimax_stream(text, voice_id, audio_path)
+            except OSError as e:
+                raise PodcastError(f"无法保存第 {line_number} 行的音频：{e}") from e
+        audio_content = text_to_speech_minimax(text, voice_id)
+        try:
+            with open(audio_path, "wb") as f:
+                f.write(audio_content)
+        except OSError as e:
+            raise PodcastError(f"无法保存第 {line_number} 行的音频：{e}") from e
+        return audio_path
+
+    order = []
+    results = {}
+    pending = {}
+
+    def collect(done_futures):
+        for future in done_futures:
+            line_number = pending.pop(future)
+            try:
+                audio_path, error = future.result(), None
+            except PodcastError as e:
+                audio_path, error = None, str(e)
+            except Exception as e:
+                # An unexpected failure still only costs this line, not the whole run
+                logger.exception("第 %s 行语音合成出错", line_number)
+                audio_path, error = None, f"语音合成出错：{e}"
+            results[line_number] = (audio_path, error)
+            if on_line_done:
+                on_line_done(line_number, audio_path, error)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for line_number, text, voice_id in lines:
+            collect([future for future in pending if future.done()])
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            order.append(line_number)
+            pending[executor.submit(synthesize, line_number, text, voice_id)] = line_number
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    return [(line_number, *results[line_number]) for line_number in order]
+
+def synthesize_dialogue(lines, output_dir, on_unit_done=None, reuse_segments=None, max_request_chars=TTS_MAX_REQUEST_CHARS, **kwargs):
+    """
+    Synthesize dialogue lines through the request planner (see tts_planner).
+
+    `lines` is an iterable of (line_number, text, voice_id) tuples, consumed lazily. Short
+    consecutive same-voice lines share one request and long lines are split into parts that
+    are synthesized concurrently and joined back in order, so every audio unit ends up in
+    `line_{first_line_number}.mp3`. Returns (units, segments): units is a list of
+    (line_numbers, path, error) in dialogue order, and segments the reuse mapping to pass
+    as `reuse_segments` next time. `on_unit_done(line_numbers, path, error)` is called from
+    the calling thread as each unit finishes; other keyword arguments go to
+    synthesize_lines_concurrently.
+    """
+    planned = []
+    requests_by_id = {}
+    part_results = {}
+    units = {}
+
+    def requests_to_synthesize():
+        for request in plan_tts_requests(lines, max_request_chars):
+            planned.append(request)
+            requests_by_id[request.request_id] = request
+            yield request.request_id, request.text, request.voice_id
+
+    def on_request_done(request_id, audio_path, error):
+        request = requests_by_id[request_id]
+        parts = part_results.setdefault(request.unit_id, {})
+        parts[request.part] = (audio_path, error)
+        if len(parts) < request.parts:
+            return
+        errors = [parts[part][1] for part in range(request.parts) if parts[part][1]]
+        if errors:
+            unit_path, unit_error = None, errors[0]
+        elif request.parts == 1:
+            unit_path, unit_error = audio_path, None
+        else:
+            unit_path = os.path.join(output_dir, f"line_{request.unit_id}.mp3")
+            try:
+                unit_path, unit_error = concatenate_audio_files(
+                    [parts[part][0] for part in range(request.parts)], unit_path
+                ), None
+            except PodcastError as e:
+                unit_path, unit_error = None, str(e)
+        units[request.unit_id] = (request.line_numbers, unit_path, unit_error)
+        if on_unit_done:
+            on_unit_done(request.line_numbers, unit_path, unit_error)
+
+    results = synthesize_lines_concurrently(
+        requests_to_synthesize(), output_dir, on_line_done=on_request_done, reuse_segments=reuse_segments, **kwargs
+    )
+    segments = synthesized_segments(
+        [(request.request_id, request.text, request.voice_id) for request in planned], results
+    )
+    unit_order = dict.fromkeys(request.unit_id for request in planned)
+    return [units[unit_id] for unit_id in unit_order], segments
+
+def synthesized_segments(lines, results):
+    """
+    Map each successfully synthesized line's tts_cache_key to its segment file.
+
+    `lines` are the (line_number, text, voice_id) tuples given to synthesize_lines_concurrently
+    and `results` what it returned; pass the mapping as `reuse_segments` to the next run.
+    """
+    paths = {line_number: path for line_number, path, _ in results if path}
+    return {
+        tts_cache_key(text, voice_id): paths[line_number]
+        for line_number, text, voice_id in lines
+        if line_number in paths
+    }
+
+@traced("concatenate")
+def concatenate_audio_files(audio_files_paths, output_path, gap_seconds=0.0, crossfade_seconds=0.0, target_dbfs=None):
+    """
+    Concatenate multiple MP3 files into one.
+
+    Without post-processing, segments that share a format are joined frame by frame
+    without decoding. Pauses between turns (`gap_seconds`), crossfades
+    (`crossfade_seconds`) and loudness levelling (`target_dbfs`), as well as segments in
+    mixed formats, go through the single-buffer assembly engine (see audio_assembly).
+    """
+    if not audio_files_paths:
+        raise PodcastError("未成功生成任何音频片段，无法创建播客。")
+
+    span = current_span()
+    span.set("segments", len(audio_files_paths))
+    post_processing = bool(gap_seconds or crossfade_seconds or target_dbfs is not None)
+    if not post_processing:
+        try:
+            concatenate_mp3_frames(audio_files_paths, output_path)
+            span.set("method", "frames")
+            span.set("bytes_out", os.path.getsize(output_path))
+            return output_path
+        except Mp3FormatError:
+            pass
+        except OSError as e:
+            raise PodcastError(f"音频合并时出错：{e}") from e
+
+    try:
+        assemble_segments(
+            audio_files_paths,
+            output_path,
+            sample_rate=MINIMAX_AUDIO_SETTING["sample_rate"],
+            gap_seconds=gap_seconds,
+            crossfade_seconds=crossfade_seconds,
+            target_dbfs=target_dbfs,
+            bitrate=f"{MINIMAX_AUDIO_SETTING['bitrate'] // 1000}k",
+        )
+    except (AudioAssemblyError, OSError) as e:
+        raise PodcastError(f"音频合并时出错：{e}") from e
+    span.set("method", "assembly")
+    span.set("bytes_out", os.path.getsize(output_path))
+    return output_path
+
+def episode_chapters(units, titles_by_line, assembly_options=None):
+    """
+    Return one Chapter per dialogue turn, titled after the speaker and the start of the line.
+
+    `units` are the (line_numbers, path, error) results of synthesize_dialogue, in order;
+    failed units are left out like they are from the episode. `titles_by_line` maps a
+    line number to (speaker, text). Turns the planner merged into one request share its
+    audio in proportion to their text length, which is how speech time divides up.
+    """
+    assembly_options = assembly_options or {}
+    ready = [(line_numbers, path) for line_numbers, path, _ in units if path]
+    unit_chapters = build_chapters(
+        [mp3_duration(path) for _, path in ready],
+        [""] * len(ready),
+        gap_seconds=assembly_options.get("gap_seconds", 0.0),
+        crossfade_seconds=assembly_options.get("crossfade_seconds", 0.0),
+    )
+    chapters = []
+    for (line_numbers, _), unit in zip(ready, unit_chapters):
+        weights = [len(titles_by_line[line_number][1]) + 1 for line_number in line_numbers]
+        start = unit.start
+        for line_number, weight in zip(line_numbers, weights):
+            end = start + (unit.end - unit.start) * weight / sum(weights)
+            speaker_name, line_text = titles_by_line[line_number]
+            title = f"{speaker_name}：{line_text[:24]}{'…' if len(line_text) > 24 else ''}"
+            chapters.append(Chapter(round(start, 3), round(end, 3), title))
+            start = end
+    return chapters
+
+def export_episode(episode_path, segment_paths, chapters, output_dir, formats):
+    """
+    Write chapter files and the requested extra formats next to an episode.
+
+    `formats` may include "hls" (AAC segments + VOD playlist in `output_dir`/hls, for static
+    hosting) and "opus"
+    (episode.opus with embedded chapters). Returns a dict of format name to path, with
+    "chapters" always present.
+    """
+    outputs = {}
+    try:
+        outputs["chapters"] = write_chapters(chapters, output_dir)[0]
+        if "hls" in formats:
+            outputs["hls"] = package_hls(segment_paths, os.path.join(output_dir, "hls"))
+        if "opus" in formats:
+            outputs["opus"] = encode_opus(
+                episode_path, os.path.splitext(episode_path)[0] + ".opus", chapters=chapters
+            )
+    except (EpisodeOutputError, OSError) as e:
+        raise PodcastError(f"导出音频格式时出错：{e}") from e
+    return outputs
+
+def dialogue_lines(dialogue, characters):
+    """
+    Turn a dialogue script into (line_number, speaker, text, voice_id) tuples for synthesis.
+
+    `characters` is a list of two {"name", "voice"} dicts, where "voice" is a key of
+    VOICE_OPTIONS. Turns by any other speaker use the second character's voice. Turns
+    missing a speaker or line are skipped with a warning.
+    """
+    voice_ids = {character["name"]: VOICE_OPTIONS[character["voice"]] for character in characters}
+    fallback_voice_id = VOICE_OPTIONS[characters[1]["voice"]]
+    for i, turn in enumerate(dialogue):
+        speaker_name = turn.get("speaker")
+        line_text = turn.get("line")
+        if not speaker_name or not line_text:
+            logger.warning("跳过无效对话片段：%s", turn)
+            continue
+        yield i + 1, speaker_name, line_text, voice_ids.get(speaker_name, fallback_voice_id)
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(path, value):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+def generate_episode(content, output_dir, characters=None, dialogue_style=None, force_refresh=False, on_stage=None, assembly_options=None, output_formats=()):
+    """
+    Run recommendation, dialogue generation, speech synthesis and concatenation for one document.
+
+    Every stage writes its result to `output_dir` (recommendations.json, script.json,
+    segments/, episode.mp3) and is skipped when that file already exists, so an interrupted
+    run resumes where it stopped. `characters` and `dialogue_style` override the AI
+    recommendation. `on_stage(stage)` is called before each stage that does work.
+    `assembly_options` are passed to concatenate_audio_files (gaps, crossfades, loudness).
+    chapters.json/chapters.vtt are written next to the episode, plus any `output_formats`
+    (see export_episode).
+    Returns the path of the finished episode.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    episode_path = os.path.join(output_dir, "episode.mp3")
+    if os.path.exists(episode_path):
+        return episode_path
+
+    def enter(stage):
+        logger.info("%s: %s", output_dir, stage)
+        if on_stage:
+            on_stage(stage)
+
+    recommendations_path = os.path.join(output_dir, "recommendations.json")
+    script_path = os.path.join(output_dir, "script.json")
+    prompt_content = None
+
+    if os.path.exists(recommendations_path):
+        recommendations = _read_json(recommendations_path)
+    elif characters and dialogue_style:
+        recommendations = {"characters": characters, "dialogue_style": dialogue_style}
+        _write_json(recommendations_path, recommendations)
+    else:
+        enter("condense")
+        prompt_content = condense_content(compact_content(content).text)
+        enter("recommend")
+        try:
+            recommendations = recommend_characters_and_voices(prompt_content, force_refresh=force_refresh)
+        except PodcastError as e:
+            logger.warning("%s 将使用默认值。", e)
+            recommendations = DEFAULT_RECOMMENDATIONS
+        _write_json(recommendations_path, recommendations)
+    characters = characters or recommendations["characters"]
+    dialogue_style = dialogue_style or recommendations["dialogue_style"]
+
+    if os.path.exists(script_path):
+        dialogue = _read_json(script_path)
+    else:
+        if prompt_content is None:
+            enter("condense")
+            prompt_content = condense_content(compact_content(content).text)
+        enter("dialogue")
+        dialogue = generate_dialogue_openai(
+            prompt_content, characters[0]["name"], characters[1]["name"], dialogue_style,
+            force_refresh=force_refresh
+        )
+        _write_json(script_path, dialogue)
+
+    enter("synthesize")
+    segments_dir = os.path.join(output_dir, "segments")
+    os.makedirs(segments_dir, exist_ok=True)
+    lines = list(dialogue_lines(dialogue, characters))
+    synthesized, _ = synthesize_dialogue(
+        ((line_number, text, voice_id) for line_number, _, text, voice_id in lines),
+        segments_dir,
+    )
+    audio_files = [audio_path for _, audio_path, _ in synthesized if audio_path]
+    errors = [error for _, _, error in synthesized if error]
+    if errors:
+        # Leave the episode unfinished so the next run retries the failed lines; finished ones are cached
+        raise PodcastError(f"{len(errors)} 段音频生成失败：{errors[0]}")
+
+    enter("concatenate")
+    # Build into a temporary name: episode.mp3 existing means every output is finished
+    partial_path = os.path.join(output_dir, "episode.partial.mp3")
+    concatenate_audio_files(audio_files, partial_path, **(assembly_options or {}))
+    chapters = episode_chapters(
+        synthesized, {line_number: (speaker, text) for line_number, speaker, text, _ in lines}, assembly_options
+    )
+    if output_formats:
+        enter("export")
+    export_episode(partial_path, audio_files, chapters, output_dir, output_formats)
+    if "opus" in output_formats:
+        os.replace(os.path.join(output_dir, "episode.partial.opus"), os.path.join(output_dir, "episode.opus"))
+    os.replace(partial_path, episode_path)
+    return episode_path
+
+def job_output_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+def run_episode_job(job_id, params, set_stage):
+    """Job handler rendering the episode prepared by submit_episode_job."""
+    output_dir = job_output_dir(job_id)
+    with open(os.path.join(output_dir, "content.txt"), encoding="utf-8") as f:
+        content = f.read()
+    episode_path = generate_episode(
+        content,
+        output_dir,
+        characters=params.get("characters"),
+        dialogue_style=params.get("dialogue_style"),
+        force_refresh=params.get("force_refresh", False),
+        on_stage=set_stage,
+        assembly_options=params.get("assembly_options"),
+        output_formats=params.get("output_formats") or (),
+    )
+    return {"episode": episode_path, "chapters": os.path.join(output_dir, "chapters.json")}
+
+@functools.lru_cache(maxsize=None)
+def get_job_queue():
+    """Return the process-wide background job queue, starting its workers on first use."""
+    return JobQueue(
+        os.path.join(JOBS_DIR, "jobs.db"),
+        {"episode": run_episode_job},
+        workers=JOB_WORKERS,
+        retention_seconds=JOB_RETENTION_SECONDS,
+        on_purge=lambda job: shutil.rmtree(job_output_dir(job["id"]), ignore_errors=True),
+    )
+
+def submit_episode_job(owner, content, characters=None, dialogue_style=None, dialogue=None, force_refresh=False, assembly_options=None, output_formats=()):
+    """
+    Queue an episode for background generation and return the job id.
+
+    A `dialogue` script (e.g. one edited in the app) is used as is; otherwise the job
+    writes one like generate_episode does. Jobs are scheduled fairly across owners.
+    """
+    job_id = uuid.uuid4().hex
+    output_dir = job_output_dir(job_id)
+    os.makedirs(output_dir)
+    with open(os.path.join(output_dir, "content.txt"), "w", encoding="utf-8") as f:
+        f.write(content)
+    if dialogue is not None:
+        _write_json(os.path.join(output_dir, "script.json"), dialogue)
+    params = {
+        "characters": characters,
+        "dialogue_style": dialogue_style,
+        "force_refresh": force_refresh,
+        "assembly_options": assembly_options,
+        "output_formats": list(output_formats),
+    }
+    return get_job_queue().submit(owner, "episode", params, job_id=job_id)
@@ -0,0 +1,88 @@
+"""
+Speculative speech synthesis of a script the user has not accepted yet.
+
+Synthesis starts in the background as soon as a script exists, so an unchanged script is
+already voiced by the time the user asks for the episode. Every line spends from a
+per-session character budget, and a line is only paid for once however many edited
+versions of the script are speculated on.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationBudget:
+    """Thread-safe character allowance for speculative synthesis, shared by one session's runs."""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.spent_chars = 0
+        self._paid = set()
+        self._lock = threading.Lock()
+
+    def charge(self, text, voice_id):
+        """Reserve the line's characters; returns False once the budget would be exceeded."""
+        with self._lock:
+            if (text, voice_id) in self._paid:
+                return True
+            if self.spent_chars + len(text) > self.max_chars:
+                return False
+            self.spent_chars += len(text)
+            self._paid.add((text, voice_id))
+            return True
+
+
+class SpeculativeSynthesis:
+    """
+    Run `synthesize(lines)` on a daemon thread for (line_number, text, voice_id) lines.
+
+    `synthesize` consumes the lines lazily and returns a reuse mapping of segments (see
+    pipeline.synthesize_dialogue). Lines are handed over in order until `budget` runs out
+    or the run is cancelled, so the synthesized part is always the start of the script.
+    `key` identifies the script the run belongs to.
+    """
+
+    def __init__(self, key, synthesize, lines, budget):
+        self.key = key
+        self.total_lines = len(lines)
+        self.submitted_lines = 0
+        self.exhausted_budget = False
+        self._segments = {}
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+        def budgeted_lines():
+            for line_number, text, voice_id in lines:
+                if self._cancelled.is_set():
+                    return
+                if not budget.charge(text, voice_id):
+                    self.exhausted_budget = True
+                    return
+                self.submitted_lines += 1
+                yield line_number, text, voice_id
+
+        def run():
+            try:
+                self._segments = synthesize(budgeted_lines())
+            except Exception as e:
+                logger.warning("Speculative synthesis failed: %s", e)
+            finally:
+                self._done.set()
+
+        threading.Thread(target=run, daemon=True, name="speculative-tts").start()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        """Stop handing over lines; requests already sent still finish and are kept."""
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def segments(self):
+        """Return the reuse mapping of finished segments, empty until the run is done."""
+        return dict(self._segments) if self.done else {}
@@ -0,0 +1,276 @@
+"""
+Lightweight tracing and metrics for the pipeline stages.
+
+Wrap a stage in `span("stage")` (or decorate it with `@traced("stage")`) and attach numbers
+to it with `current_span().set(...)`/`.add(...)`. Finished spans are aggregated into
+Prometheus-style metrics (`render_prometheus()`), kept in a short in-memory history for
+the app's profiling panel (`recent_spans()`), and appended to a JSONL trace file when
+TELEMETRY_TRACE_FILE is set. Recognised span attributes:
+
+    bytes_in / bytes_out             payload sizes
+    prompt_tokens / completion_tokens LLM usage
+    retries                          HTTP attempts beyond the first
+    cache_hit                        True/False for lookups against a cache
+"""
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.getenv("TELEMETRY_TRACE_FILE")
+RECENT_SPANS = int(os.getenv("TELEMETRY_RECENT_SPANS", "2000"))
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNTED_ATTRIBUTES = ("bytes_in", "bytes_out", "prompt_tokens", "completion_tokens", "retries", "tokens_saved")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed stage; attributes hold whatever the stage wants to report about itself."""
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+        self.start_time = time.time()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def elapsed(self):
+        """Seconds since the span started."""
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Stand-in returned by current_span() outside any span, so callers never need to check."""
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+    def elapsed(self):
+        return 0.0
+
+
+class MetricsRecorder:
+    """Thread-safe aggregation of finished spans into counters and duration histograms."""
+
+    def __init__(self, trace_file=None, recent=RECENT_SPANS):
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._recent = deque(maxlen=recent)
+
+    def _count(self, name, labels, amount):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record(self, span):
+        record = span.to_dict()
+        with self._lock:
+            labels = (("stage", span.name), ("status", span.status))
+            histogram = self._histograms.setdefault(labels, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram[i] += 1
+            histogram[len(DURATION_BUCKETS)] += 1
+            histogram[-1] += span.duration
+
+            for attribute in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value:
+                    self._count(f"podcast_stage_{attribute}_total", {"stage": span.name}, value)
+            if "cache_hit" in span.attributes:
+                result = "hit" if span.attributes["cache_hit"] else "miss"
+                self._count("podcast_cache_lookups_total", {"stage": span.name, "result": result}, 1)
+
+            self._recent.append(record)
+            if self.trace_file:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def recent_spans(self):
+        with self._lock:
+            return list(self._recent)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._recent.clear()
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        def format_labels(labels):
+            return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+        lines = []
+        with self._lock:
+            if self._histograms:
+                lines.append("# HELP podcast_stage_duration_seconds Wall-clock time spent in each pipeline stage.")
+                lines.append("# TYPE podcast_stage_duration_seconds histogram")
+            for labels, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f"podcast_stage_duration_seconds_bucket{format_labels(labels + (('le', bound),))} {count}")
+                count = histogram[len(DURATION_BUCKETS)]
+                lines.append(f"podcast_stage_duration_seconds_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"podcast_stage_duration_seconds_count{format_labels(labels)} {count}")
+                lines.append(f"podcast_stage_duration_seconds_sum{format_labels(labels)} {histogram[-1]:.6f}")
+
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} counter")
+                    declared.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_recorder = MetricsRecorder(trace_file=TRACE_FILE)
+
+
+def get_recorder():
+    """Return the process-wide metrics recorder."""
+    return _recorder
+
+
+def current_span():
+    """Return the innermost open span in this thread, or a no-op span."""
+    return _current_span.get() or _NullSpan()
+
+
+class span:
+    """
+    Context manager timing a pipeline stage.
+
+    Spans opened inside another span in the same thread record it as their parent.
+    Exceptions mark the span as failed and propagate unchanged.
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self._span = Span(self.name, parent=_current_span.get(), **self.attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # A span held open by a generator can be closed from another context (e.g. on garbage collection)
+            pass
+        self._span.duration = self._span.elapsed()
+        if exc_type is not None:
+            self._span.status = "error"
+            self._span.error = str(exc_value)
+        _recorder.record(self._span)
+        return False
+
+
+def traced(name):
+    """Decorator running every call of a function inside `span(name)`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(response):
+    """Copy the token usage of an OpenAI-compatible response onto the current span."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    current = current_span()
+    current.add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    current.add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def recent_spans():
+    return _recorder.recent_spans()
+
+
+def render_prometheus():
+    return _recorder.render_prometheus()
+
+
+def summarize_spans(spans):
+    """Return per-stage rows (count, errors, mean/p95/total seconds) for display."""
+    by_stage = {}
+    for record in spans:
+        by_stage.setdefault(record["name"], []).append(record)
+    rows = []
+    for name, records in sorted(by_stage.items()):
+        durations = sorted(record["duration"] for record in records)
+        rows.append({
+            "stage": name,
+            "count": len(records),
+            "errors": sum(1 for record in records if record["status"] != "ok"),
+            "mean_s": round(sum(durations) / len(durations), 3),
+            "p95_s": round(durations[max(0, int(len(durations) * 0.95 + 0.5) - 1)], 3),
+            "total_s": round(sum(durations), 3),
+            "cache_hits": sum(1 for record in records if record["attributes"].get("cache_hit")),
+            "bytes_out": sum(record["attributes"].get("bytes_out", 0) for record in records),
+        })
+    return rows
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def start_metrics_server(port):
+    """Serve /metrics for Prometheus on `port` from a daemon thread; repeated calls are no-ops."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
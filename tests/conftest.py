@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_servers import MinimaxStubHandler, StubServer  # noqa: E402
+
+
+@pytest.fixture
+def minimax_stub(monkeypatch, tmp_path):
+    """
+    Start a Minimax stub with the given settings and point the pipeline at it.
+
+    Each stub gets a fresh TTS cache and concurrency limiter (as `server.limiter`), and
+    retries back off for milliseconds only.
+    """
+    import pipeline
+    import transport
+    from cache import DiskCache
+
+    servers = []
+
+    def start(**settings):
+        server = StubServer(MinimaxStubHandler, **settings).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(pipeline, "MINIMAX_API_URL_TEMPLATE", server.base_url + "/v1/t2a_v2?GroupId={group_id}")
+        monkeypatch.setattr(pipeline, "MINIMAX_API_KEY", "test-key")
+        monkeypatch.setattr(pipeline, "MINIMAX_GROUP_ID", "test-group")
+        cache = DiskCache(str(tmp_path / "tts_cache"), 1024 * 1024, suffix=".mp3")
+        monkeypatch.setattr(pipeline, "get_tts_cache", lambda: cache)
+        server.limiter = transport.AdaptiveConcurrencyLimiter(4)
+        monkeypatch.setattr(pipeline, "get_minimax_limiter", lambda: server.limiter)
+        monkeypatch.setattr(transport, "RETRY_BASE_DELAY", 0.01)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
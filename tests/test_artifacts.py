@@ -0,0 +1,33 @@
+import os
+
+from artifacts import ArtifactStore
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(bytes(size))
+
+
+def test_hard_linked_runs_count_once_against_the_quota(tmp_path):
+    store = ArtifactStore(str(tmp_path), 10_000, session_quota_bytes=1_000, max_age_seconds=3600)
+    first = store.new_run_dir("session")
+    write(os.path.join(first, "line_0.mp3"), 800)
+    for _ in range(5):
+        run = store.new_run_dir("session")
+        os.link(os.path.join(first, "line_0.mp3"), os.path.join(run, "line_0.mp3"))
+
+    store.new_run_dir("session")
+    assert os.path.exists(first)
+    assert store.stats()["bytes"] == 800
+
+
+def test_oldest_runs_are_pruned_over_the_quota(tmp_path):
+    store = ArtifactStore(str(tmp_path), 10_000, session_quota_bytes=1_000, max_age_seconds=3600)
+    runs = []
+    for i in range(3):
+        runs.append(store.new_run_dir("session"))
+        write(os.path.join(runs[-1], "episode.mp3"), 600)
+        os.utime(runs[-1], (i, i))
+
+    store.new_run_dir("session")
+    assert [os.path.exists(run) for run in runs] == [False, False, True]
@@ -0,0 +1,50 @@
+import os
+
+from cache import DiskCache, make_cache_key
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000, suffix=".bin")
+    key = make_cache_key("text", "voice")
+    assert cache.get(key) is None
+    cache.put(key, b"audio")
+    assert cache.get(key) == b"audio"
+    assert cache.stats() == {"hits": 1, "misses": 1, "bytes": 5}
+
+
+def test_evicts_least_recently_used_entries_over_cap(tmp_path):
+    cache = DiskCache(str(tmp_path), 250)
+    keys = [make_cache_key(i) for i in range(3)]
+    for age, key in enumerate(keys[:2]):
+        cache.put(key, bytes(100))
+        os.utime(cache._path(key), (age, age))
+    cache.get(keys[0])  # refreshes the oldest entry
+    cache.put(keys[2], bytes(100))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()["bytes"] == 200
+
+
+def test_expired_entries_miss_and_are_evicted_first(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000, ttl_seconds=60)
+    old, new = make_cache_key("old"), make_cache_key("new")
+    cache.put(old, b"x")
+    cache.put(new, b"y")
+    os.utime(cache._path(old), (0, 0))
+    assert cache.get(old) is None
+
+    cache.evict()
+    assert not os.path.exists(cache._path(old))
+    assert cache.get(new) == b"y"
+
+
+def test_overwriting_an_entry_replaces_its_size(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    key = make_cache_key("same line")
+    cache.put(key, bytes(100))
+    cache.put(key, bytes(100))
+    source = tmp_path / "segment.mp3"
+    source.write_bytes(bytes(60))
+    cache.put_file(key, str(source))
+    assert cache.stats()["bytes"] == 60
@@ -0,0 +1,14 @@
+from chunking import estimate_tokens, truncate_to_tokens
+
+
+def test_truncation_keeps_as_much_text_as_the_budget_allows():
+    latin = "word " * 1000
+    truncated = truncate_to_tokens(latin, 100)
+    assert estimate_tokens(truncated) == 100
+    assert len(truncated) == 400
+    assert latin.startswith(truncated)
+
+
+def test_truncation_counts_cjk_characters_as_tokens():
+    assert truncate_to_tokens("中文内容" * 10, 6) == "中文内容中文"
+    assert truncate_to_tokens("short", 100) == "short"
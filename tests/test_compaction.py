@@ -0,0 +1,34 @@
+from compaction import compact_text
+
+
+def page(number, body):
+    return "\n".join(["ACME 年度报告 2024", *body, f"第 {number} 页"])
+
+
+def test_strips_running_headers_and_page_numbers():
+    bodies = [["市场概况。", "收入增长。"], ["产品进展。", "研发投入。"], ["团队建设。", "人员扩充。"], ["未来展望。"]]
+    pages = [page(i, body) for i, body in enumerate(bodies, 1)]
+    result = compact_text("\f".join(pages))
+    assert "ACME" not in result.text and "第 " not in result.text
+    assert all(line in result.text for body in bodies for line in body)
+    assert result.removed_lines == 8
+    assert result.tokens_after < result.tokens_before
+
+
+def test_rejoins_lines_wrapped_mid_sentence_on_pdf_pages():
+    body = ["这是一段很长的正文，排版时在行尾被", "折行了。", "一、下一项", "The trans-", "mission works."]
+    result = compact_text("\f".join([page(1, body), page(2, ["第二页。"]), page(3, ["第三页。"])]))
+    assert "这是一段很长的正文，排版时在行尾被折行了。" in result.text
+    assert "\n一、下一项" in result.text
+    assert "The transmission works." in result.text
+
+
+def test_text_without_pages_keeps_its_lines():
+    text = "第一章 概述\n本报告介绍了公司的发展。\n一、背景\n二、方法"
+    assert compact_text(text).text == text
+
+
+def test_collapses_whitespace_and_repeated_paragraphs():
+    notice = "本文件仅供内部参考，未经书面许可不得转载、摘编或用于任何商业用途。"
+    text = f"标题  　内容\n\n\n\n{notice}\n\n正文\n\n{notice}"
+    assert compact_text(text).text == f"标题 内容\n\n{notice}\n\n正文"
@@ -0,0 +1,22 @@
+from episode_output import Chapter, _write_playlist, build_chapters, read_chapters, write_chapters
+
+
+def test_chapters_follow_gaps_and_crossfades():
+    assert build_chapters([2.0, 3.0], ["a", "b"], gap_seconds=0.5) == [Chapter(0.0, 2.0, "a"), Chapter(2.5, 5.5, "b")]
+    assert build_chapters([2.0, 3.0], ["a", "b"], crossfade_seconds=0.5) == [Chapter(0.0, 2.0, "a"), Chapter(1.5, 4.5, "b")]
+
+
+def test_chapters_round_trip_through_json(tmp_path):
+    chapters = [Chapter(0.0, 2.0, "小林：你好"), Chapter(2.0, 4.5, "小雅：再见")]
+    write_chapters(chapters, str(tmp_path))
+    assert read_chapters(str(tmp_path)) == chapters
+    assert (tmp_path / "chapters.vtt").read_text(encoding="utf-8").startswith("WEBVTT\n\n1\n00:00:00.000 --> 00:00:02.000")
+
+
+def test_playlist_is_vod_with_target_covering_every_segment(tmp_path):
+    path = str(tmp_path / "playlist.m3u8")
+    _write_playlist(path, [("segment_00000.ts", 3.2), ("segment_00001.ts", 5.01)])
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert "#EXT-X-TARGETDURATION:6" in lines
+    assert "#EXT-X-PLAYLIST-TYPE:VOD" in lines
+    assert lines[-1] == "#EXT-X-ENDLIST"
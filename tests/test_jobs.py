@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+
+from jobs import _SCHEMA, JobQueue
+
+
+class BlockingHandler:
+    """Job handler recording the order jobs start in and holding each until released."""
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+        self._condition = threading.Condition()
+
+    def __call__(self, job_id, params, set_stage):
+        release = threading.Event()
+        with self._condition:
+            self.release[job_id] = release
+            self.started.append(job_id)
+            self._condition.notify_all()
+        release.wait(10)
+        return {"job": job_id}
+
+    def wait_started(self, count):
+        with self._condition:
+            assert self._condition.wait_for(lambda: len(self.started) >= count, timeout=10)
+
+
+def wait_for_status(queue, job_id, status):
+    deadline = time.time() + 10
+    while queue.get(job_id)["status"] != status:
+        assert time.time() < deadline, f"job {job_id} never reached {status}"
+        time.sleep(0.01)
+
+
+def test_another_owners_job_is_claimed_before_a_backlog(tmp_path):
+    handler = BlockingHandler()
+    queue = JobQueue(str(tmp_path / "jobs.db"), {"render": handler}, workers=1)
+    first = queue.submit("alice", "render", {}, job_id="alice-1")
+    handler.wait_started(1)
+    for i in (2, 3):
+        queue.submit("alice", "render", {}, job_id=f"alice-{i}")
+    queue.submit("bob", "render", {}, job_id="bob-1")
+
+    assert queue.queue_position("bob-1") == 0
+    assert queue.queue_position("alice-3") == 2
+
+    handler.release[first].set()
+    handler.wait_started(2)
+    assert handler.started == ["alice-1", "bob-1"]
+    for count in (3, 4):
+        handler.release[handler.started[-1]].set()
+        handler.wait_started(count)
+    assert handler.started == ["alice-1", "bob-1", "alice-2", "alice-3"]
+    handler.release["alice-3"].set()
+
+
+def test_jobs_left_running_are_resumed_on_start(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    # A previous process's database, written directly so no worker can pick the job up first
+    with sqlite3.connect(db_path) as db:
+        db.executescript(_SCHEMA)
+        db.execute(
+            "INSERT INTO jobs (id, owner, kind, params, status, created_at, started_at) "
+            "VALUES ('interrupted', 'alice', 'render', '{}', 'running', 0, 0)"
+        )
+
+    handler = BlockingHandler()
+    queue = JobQueue(db_path, {"render": handler}, workers=1)
+    handler.wait_started(1)
+    assert handler.started == ["interrupted"]
+    handler.release["interrupted"].set()
+    wait_for_status(queue, "interrupted", "done")
+    assert queue.get("interrupted")["result"] == {"job": "interrupted"}
+
+
+def test_purge_removes_only_finished_jobs(tmp_path):
+    purged = []
+    handler = BlockingHandler()
+    queue = JobQueue(
+        str(tmp_path / "jobs.db"), {"render": handler}, workers=1, retention_seconds=0, on_purge=purged.append
+    )
+    queue.submit("alice", "render", {}, job_id="done")
+    handler.wait_started(1)
+    handler.release["done"].set()
+    wait_for_status(queue, "done", "done")
+    queue.submit("alice", "render", {}, job_id="running")
+    handler.wait_started(2)
+
+    assert queue.purge_finished() == 1
+    assert [job["id"] for job in purged] == ["done"]
+    assert queue.get("done") is None
+    assert queue.get("running")["status"] == "running"
+    handler.release["running"].set()
@@ -0,0 +1,29 @@
+from json_stream import JsonArrayStreamParser
+
+
+def feed_all(parser, pieces):
+    items = []
+    for piece in pieces:
+        items.extend(parser.feed(piece))
+    return items
+
+
+def test_objects_complete_as_their_closing_brace_arrives():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('```json\n[{"speaker": "A", "li') == []
+    assert parser.feed('ne": "你好"}, {"speaker"') == [{"speaker": "A", "line": "你好"}]
+    assert parser.feed(': "B", "line": "再见"}]\n```') == [{"speaker": "B", "line": "再见"}]
+    assert parser.finished
+
+
+def test_brackets_and_escapes_inside_strings_are_ignored():
+    text = '[{"line": "a } ] { [ \\" b"}, {"nested": {"x": [1, 2]}}]'
+    items = feed_all(JsonArrayStreamParser(), text)
+    assert items == [{"line": 'a } ] { [ " b'}, {"nested": {"x": [1, 2]}}]
+
+
+def test_text_after_the_array_is_ignored():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"a": 1}] [{"b": 2}]') == [{"a": 1}]
+    assert parser.finished
+    assert parser.feed('{"c": 3}') == []
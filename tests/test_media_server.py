@@ -0,0 +1,120 @@
+import http.client
+import os
+import threading
+import time
+
+import pytest
+
+from media_server import GROWING_SUFFIX, GrowingFile, media_path, media_url, start_media_server
+
+EPISODE = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def roots(tmp_path):
+    episodes = tmp_path / "artifacts"
+    (episodes / "run").mkdir(parents=True)
+    (episodes / "run" / "episode.mp3").write_bytes(EPISODE)
+    (episodes / "run" / "chapters.json").write_text("{}")
+    (episodes / "run" / "script.json").write_text("[]")
+    (tmp_path / "secret.mp3").write_bytes(b"private")
+    return {"artifacts": str(episodes)}
+
+
+@pytest.fixture
+def server(roots):
+    server = start_media_server(0, tuple(roots.items()))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, headers=None, method="GET"):
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.request(method, path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_paths_stay_inside_their_root(roots):
+    assert media_path(roots, "/artifacts/run/episode.mp3") == os.path.realpath(
+        os.path.join(roots["artifacts"], "run", "episode.mp3")
+    )
+    assert media_path(roots, "/artifacts/../secret.mp3") is None
+    assert media_path(roots, "/artifacts/run/%2e%2e/%2e%2e/secret.mp3") is None
+    assert media_path(roots, "/other/run/episode.mp3") is None
+
+
+def test_only_episode_outputs_are_served(roots):
+    assert media_path(roots, "/artifacts/run/chapters.json") is not None
+    assert media_path(roots, "/artifacts/run/script.json") is None
+    assert media_path(roots, "/artifacts/run/missing.mp3") is None
+
+
+def test_urls_round_trip_to_paths(roots):
+    path = os.path.join(roots["artifacts"], "run", "episode.mp3")
+    url = media_url("http://localhost:8600/", roots, path)
+    assert url == "http://localhost:8600/artifacts/run/episode.mp3"
+    assert media_url("http://localhost:8600", roots, "/tmp/elsewhere.mp3") is None
+
+
+def test_serves_whole_file_and_download_name(server):
+    response, body = get(server, "/artifacts/run/episode.mp3?download=%E6%92%AD%E5%AE%A2.mp3")
+    assert response.status == 200
+    assert body == EPISODE
+    assert response.getheader("Accept-Ranges") == "bytes"
+    assert response.getheader("Content-Disposition") == "attachment; filename*=UTF-8''%E6%92%AD%E5%AE%A2.mp3"
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=1000-5000", 1000, len(EPISODE) - 1),
+    ("bytes=-24", len(EPISODE) - 24, len(EPISODE) - 1),
+    ("bytes=1020-", 1020, len(EPISODE) - 1),
+])
+def test_serves_byte_ranges(server, range_header, start, end):
+    response, body = get(server, "/artifacts/run/episode.mp3", {"Range": range_header})
+    assert response.status == 206
+    assert body == EPISODE[start:end + 1]
+    assert response.getheader("Content-Range") == f"bytes {start}-{end}/{len(EPISODE)}"
+
+
+def test_unsatisfiable_range_is_416(server):
+    response, body = get(server, "/artifacts/run/episode.mp3", {"Range": f"bytes={len(EPISODE)}-"})
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{len(EPISODE)}"
+    assert body == b""
+
+
+def test_head_sends_no_body_and_private_files_are_404(server):
+    response, body = get(server, "/artifacts/run/episode.mp3", method="HEAD")
+    assert response.status == 200 and body == b""
+    assert response.getheader("Content-Length") == str(len(EPISODE))
+    assert get(server, "/artifacts/../secret.mp3")[0].status == 404
+    assert get(server, "/artifacts/run/script.json")[0].status == 404
+
+
+def test_growing_file_streams_until_its_writer_closes(roots, server):
+    path = os.path.join(roots["artifacts"], "run", "live.mp3")
+    writes_done = threading.Event()
+
+    def write_slowly():
+        with GrowingFile(path) as live:
+            for _ in range(4):
+                live.write(EPISODE[:256])
+                time.sleep(0.1)
+        writes_done.set()
+
+    writer = threading.Thread(target=write_slowly)
+    writer.start()
+    while not os.path.exists(path + GROWING_SUFFIX) and not writes_done.is_set():
+        time.sleep(0.01)
+    response, body = get(server, "/artifacts/run/live.mp3")
+    writer.join()
+
+    assert response.status == 200
+    assert response.getheader("Content-Length") is None
+    assert body == EPISODE[:256] * 4
+    assert not os.path.exists(path + GROWING_SUFFIX)
@@ -0,0 +1,26 @@
+from mp3_concat import iter_mp3_frames
+
+# One silent MPEG-1 Layer III frame: 32 kHz, 128 kbps, mono
+SILENT_FRAME = bytes([0xFF, 0xFB, 0x98, 0xC4]) + bytes(572)
+MPEG1_32KHZ_MONO = (3, 32000, True)
+
+
+def frames(data):
+    return [(bytes(frame), stream_format) for frame, stream_format in iter_mp3_frames(data)]
+
+
+def test_yields_every_frame_with_its_format():
+    assert frames(SILENT_FRAME * 3) == [(SILENT_FRAME, MPEG1_32KHZ_MONO)] * 3
+
+
+def test_skips_tags_junk_and_vbr_header():
+    id3v2 = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + bytes(10)
+    xing = bytearray(SILENT_FRAME)
+    xing[21:25] = b"Xing"
+    id3v1 = b"TAG" + bytes(125)
+    data = id3v2 + bytes(xing) + SILENT_FRAME + b"junk" + SILENT_FRAME + id3v1
+    assert frames(data) == [(SILENT_FRAME, MPEG1_32KHZ_MONO)] * 2
+
+
+def test_drops_truncated_final_frame():
+    assert len(frames(SILENT_FRAME * 2 + SILENT_FRAME[:100])) == 2
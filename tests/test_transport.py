@@ -0,0 +1,72 @@
+import email.utils
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import transport
+from benchmarks.stub_servers import MinimaxStubHandler, StubServer
+from transport import AdaptiveConcurrencyLimiter, post_with_retry, retry_after_seconds
+
+
+def response_with(headers):
+    return SimpleNamespace(headers=headers)
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds(response_with({"Retry-After": "1.5"})) == 1.5
+    assert retry_after_seconds(response_with({"Retry-After": "-3"})) == 0.0
+    in_ten_seconds = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 < retry_after_seconds(response_with({"Retry-After": in_ten_seconds})) <= 10
+    assert retry_after_seconds(response_with({"Retry-After": "soon"})) is None
+    assert retry_after_seconds(response_with({})) is None
+
+
+def test_limit_halves_on_throttle_and_grows_back_on_success():
+    limiter = AdaptiveConcurrencyLimiter(8, cooldown=0)
+    for expected in (4, 2, 1, 1):
+        limiter.on_throttle()
+        assert limiter.limit == expected
+    limiter.on_success()
+    assert limiter.limit == 2
+    for _ in range(40):
+        limiter.on_success()
+    assert limiter.limit == 8
+
+
+def test_throttles_within_the_cooldown_count_once():
+    limiter = AdaptiveConcurrencyLimiter(8, cooldown=60)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 4
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(transport, "RETRY_BASE_DELAY", 0.0)
+
+
+def test_429_is_retried_after_retry_after_then_returned(no_backoff):
+    limiter = AdaptiveConcurrencyLimiter(4, cooldown=0)
+    with StubServer(MinimaxStubHandler, rate_429=1.0) as server:
+        started = time.perf_counter()
+        response = post_with_retry(server.base_url, limiter=limiter, max_retries=2, json={"text": "你好"})
+        elapsed = time.perf_counter() - started
+
+    assert response.status_code == 429
+    assert server.requests_served == 3
+    # The stub asks for 0.2 s before each retry; the backoff itself is zero here
+    assert elapsed >= 0.4
+    assert limiter.limit == 1
+
+
+def test_success_releases_the_slot_and_grows_the_limit(no_backoff):
+    limiter = AdaptiveConcurrencyLimiter(4)
+    limiter.limit = 2.0
+    with StubServer(MinimaxStubHandler) as server:
+        response = post_with_retry(server.base_url, limiter=limiter, json={"text": "你好"})
+
+    assert response.status_code == 200
+    assert server.requests_served == 1
+    assert limiter.limit == 2.5
+    assert limiter._in_flight == 0
@@ -0,0 +1,50 @@
+from tts_planner import plan_tts_requests, split_long_text
+
+
+def test_short_text_is_not_split():
+    assert split_long_text("你好。", 10) == ["你好。"]
+
+
+def test_splits_at_sentence_ends_into_even_parts():
+    text = "第一句话比较短。" * 6
+    parts = split_long_text(text, 20)
+    assert "".join(parts) == text
+    assert all(len(part) <= 20 and part.endswith("。") for part in parts)
+    assert len(parts) == 3
+
+
+def test_unpunctuated_text_is_cut_into_equal_parts():
+    assert [len(part) for part in split_long_text("好的" * 200, 300)] == [200, 200]
+
+
+def test_merges_same_voice_runs_within_limit():
+    lines = [(0, "你好", "a"), (1, "最近怎么样", "a"), (2, "还不错", "b"), (3, "那就好", "a")]
+    requests = list(plan_tts_requests(lines, 20))
+    assert [(r.unit_id, r.line_numbers, r.text, r.voice_id) for r in requests] == [
+        (0, (0, 1), "你好\n最近怎么样", "a"),
+        (2, (2,), "还不错", "b"),
+        (3, (3,), "那就好", "a"),
+    ]
+
+
+def test_long_line_becomes_ordered_parts():
+    lines = [(0, "短句。", "a"), (1, "这一句很长，需要拆开。" * 4, "a")]
+    requests = list(plan_tts_requests(lines, 20))
+    assert requests[0].line_numbers == (0,)
+    parts = requests[1:]
+    assert [(r.unit_id, r.part, r.parts) for r in parts] == [(1, i, len(parts)) for i in range(len(parts))]
+    assert "".join(r.text for r in parts) == "这一句很长，需要拆开。" * 4
+    assert [r.request_id for r in parts][0] == "1.part1"
+
+
+def test_requests_stay_at_most_one_line_behind_the_input():
+    seen = []
+
+    def lines():
+        for line in [(0, "甲", "a"), (1, "乙", "b"), (2, "丙", "a")]:
+            seen.append(line[0])
+            yield line
+
+    requests = plan_tts_requests(lines(), 20)
+    assert next(requests).line_numbers == (0,)
+    assert seen == [0, 1]
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+import pipeline
+from benchmarks.stub_servers import fake_mp3
+from pipeline import HexStreamDecoder, PodcastError
+
+TEXT = "这是一段用来测试流式语音合成的文本。"
+
+
+def test_hex_decoder_carries_odd_digit_to_next_piece():
+    decoder = HexStreamDecoder()
+    assert decoder.decode("abc") == b"\xab"
+    assert decoder.decode("d") == b"\xcd"
+    assert decoder.decode("") == b""
+    decoder.finish()
+
+
+def test_hex_decoder_rejects_incomplete_input():
+    decoder = HexStreamDecoder()
+    decoder.decode("a")
+    with pytest.raises(ValueError):
+        decoder.finish()
+
+
+def test_stream_joins_bytes_split_across_events(minimax_stub, tmp_path):
+    minimax_stub(stream_hex_chars=1001)
+    output_path = str(tmp_path / "line.mp3")
+    chunks = []
+
+    pipeline.text_to_speech_minimax_stream(TEXT, "voice", output_path, on_chunk=chunks.append)
+
+    with open(output_path, "rb") as f:
+        assert f.read() == fake_mp3(TEXT)
+    assert len(chunks) > 1
+    assert b"".join(chunks) == fake_mp3(TEXT)
+
+
+def test_stream_error_event_raises_and_leaves_nothing_behind(minimax_stub, tmp_path):
+    minimax_stub(stream_error_after=2)
+    output_path = str(tmp_path / "line.mp3")
+
+    with pytest.raises(PodcastError, match="unknown error"):
+        pipeline.text_to_speech_minimax_stream(TEXT, "voice", output_path)
+
+    assert os.listdir(tmp_path / "tts_cache") == []
+    assert not os.path.exists(output_path)
+    assert not os.path.exists(output_path + ".part")
+
+
+def test_stream_json_error_body_raises(minimax_stub, tmp_path):
+    minimax_stub(error_body={"base_resp": {"status_code": 1004, "status_msg": "authorization failed"}})
+
+    with pytest.raises(PodcastError, match="authorization failed"):
+        pipeline.text_to_speech_minimax_stream(TEXT, "voice", str(tmp_path / "line.mp3"))
+
+
+def test_json_error_body_without_data_raises(minimax_stub):
+    minimax_stub(error_body={"data": None, "base_resp": {"status_code": 1004, "status_msg": "authorization failed"}})
+
+    with pytest.raises(PodcastError, match="authorization failed"):
+        pipeline.text_to_speech_minimax(TEXT, "voice")
+
+
+def test_non_streaming_audio_matches_stub(minimax_stub):
+    server = minimax_stub()
+
+    assert pipeline.text_to_speech_minimax(TEXT, "voice") == fake_mp3(TEXT)
+    assert pipeline.text_to_speech_minimax(TEXT, "voice") == fake_mp3(TEXT)
+    assert server.requests_served == 1
+
+
+def test_stream_json_throttle_body_is_retried(minimax_stub, tmp_path):
+    server = minimax_stub(
+        error_body={"data": None, "base_resp": {"status_code": 1002, "status_msg": "rate limit"}},
+        failing_requests=2,
+    )
+    output_path = str(tmp_path / "line.mp3")
+
+    pipeline.text_to_speech_minimax_stream(TEXT, "voice", output_path)
+
+    with open(output_path, "rb") as f:
+        assert f.read() == fake_mp3(TEXT)
+    assert server.requests_served == 3
+    assert server.limiter.limit < 4
+
+
+def test_stream_throttle_event_is_retried(minimax_stub, tmp_path):
+    server = minimax_stub(stream_error_after=0, stream_error_code=1002, failing_requests=2)
+    output_path = str(tmp_path / "line.mp3")
+
+    pipeline.text_to_speech_minimax_stream(TEXT, "voice", output_path)
+
+    with open(output_path, "rb") as f:
+        assert f.read() == fake_mp3(TEXT)
+    assert server.requests_served == 3
+    assert server.limiter.limit < 4
+
+
+def test_stream_throttling_outlasting_retries_raises(minimax_stub, tmp_path):
+    server = minimax_stub(stream_error_after=1, stream_error_code=1002)
+
+    with pytest.raises(PodcastError, match="限流"):
+        pipeline.text_to_speech_minimax_stream(TEXT, "voice", str(tmp_path / "line.mp3"))
+
+    assert server.requests_served == pipeline.HTTP_MAX_RETRIES + 1
+
+
+def test_streamed_request_holds_its_limiter_slot_until_read(minimax_stub, tmp_path):
+    server = minimax_stub()
+    in_flight = []
+
+    pipeline.text_to_speech_minimax_stream(
+        TEXT, "voice", str(tmp_path / "line.mp3"), on_chunk=lambda chunk: in_flight.append(server.limiter._in_flight)
+    )
+
+    assert in_flight and set(in_flight) == {1}
+    assert server.limiter._in_flight == 0
@@ -0,0 +1,102 @@
+"""Streaming text extraction from uploaded .txt/.pdf/.docx content."""
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import docx
+import PyPDF2
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+
+# Large PDFs are split into page ranges that worker processes extract in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Each worker holds its own parsed copy of the document, so the pool stays small
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this many pages, starting worker processes costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+_worker_reader = None
+
+
+def _init_pdf_worker(path):
+    """Open the PDF once per worker process; pages are read from disk as they are extracted."""
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(path)
+
+
+def _extract_pdf_pages(start, stop):
+    """Extract the text of pages [start, stop) in a worker process."""
+    return "\f".join(_worker_reader.pages[i].extract_text() or "" for i in range(start, stop))
+
+
+def iter_pdf_text(data):
+    """
+    Yield the text of a PDF in page order.
+
+    Small documents are extracted in-process. Larger ones are fanned out to a pool of
+    at most PDF_MAX_WORKERS processes by page range; results are yielded in order as
+    soon as each range is ready. Workers read the document from one temporary file
+    rather than each receiving a copy of its bytes.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_MAX_WORKERS <= 1:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    page_ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    # The parent only needed the page count; workers parse the document themselves
+    del reader
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # Spawned workers avoid forking the (multi-threaded) Streamlit server process
+        executor = ProcessPoolExecutor(
+            max_workers=min(PDF_MAX_WORKERS, len(page_ranges)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pdf_worker,
+            initargs=(path,),
+        )
+        try:
+            futures = [executor.submit(_extract_pdf_pages, start, stop) for start, stop in page_ranges]
+            for future in futures:
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        # Workers still running keep their open handle; the name is no longer needed
+        os.unlink(path)
+
+
+def iter_docx_text(data):
+    """Yield the paragraphs of a .docx document, separated by newlines."""
+    document = docx.Document(io.BytesIO(data))
+    for i, paragraph in enumerate(document.paragraphs):
+        yield paragraph.text if i == 0 else "\n" + paragraph.text
+
+
+def iter_document_text(file_extension, data):
+    """
+    Yield the text of an uploaded document piece by piece from its bytes, `data`.
+
+    Text, Word documents and small PDFs are parsed from `data` in memory; large PDFs go
+    through a temporary file that the extraction workers share (see iter_pdf_text).
+    Joining the pieces with "" gives the full text of the document. PDF pages are
+    separated by form feeds, so later stages can tell page furniture from content.
+    """
+    if file_extension == '.txt':
+        yield data.decode('utf-8')
+    elif file_extension == '.pdf':
+        for i, page_text in enumerate(iter_pdf_text(data)):
+            yield page_text if i == 0 else "\f" + page_text
+    elif file_extension == '.docx':
+        yield from iter_docx_text(data)
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
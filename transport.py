@@ -0,0 +1,212 @@
+"""Shared HTTP transport: pooled sessions, long-lived API clients, retries and adaptive concurrency."""
+import email.utils
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+from telemetry import current_span
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+SSE_READ_CHUNK_SIZE = 16 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_session():
+    """Return the process-wide requests session, which keeps connections alive between calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client(api_key, base_url):
+    """
+    Return a long-lived OpenAI-compatible client for `base_url`.
+
+    The SDK already retries 429/5xx responses with exponential backoff and honours
+    Retry-After, so it only needs the shared retry budget.
+    """
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=HTTP_MAX_RETRIES)
+
+
+def backoff_delay(attempt):
+    """Return a full-jitter exponential backoff delay for the given retry attempt (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def retry_after_seconds(response):
+    """Return the delay requested by a Retry-After header (seconds or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit shared by every caller of a rate-limited API.
+
+    Use as a context manager around each request, or call acquire()/release() when a
+    request outlives one block. Successful requests grow the limit by about one per round
+    of `limit` requests (additive increase); a throttled response halves it (multiplicative decrease), at most once per `cooldown` seconds so a burst
+    of 429s from the same window only counts once.
+
+    With `rate_per_minute`, request starts are also spaced evenly so the API never sees
+    more than that many requests a minute, however many sessions share the limiter.
+    """
+
+    def __init__(self, maximum, minimum=1, cooldown=1.0, rate_per_minute=0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._min_interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def acquire(self):
+        """Wait for a free slot (and the next start time under `rate_per_minute`), then take it."""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+                logger.info("Rate limited; concurrency limit lowered to %d", int(self.limit))
+
+
+def _release_on_close(response, limiter):
+    """Give back the limiter slot of a streamed response the first time it is closed."""
+    close = response.close
+    released = []
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if not released:
+                released.append(True)
+                limiter.release()
+
+    response.close = close_and_release
+
+
+def post_with_retry(url, limiter=None, is_throttled=None, max_retries=HTTP_MAX_RETRIES, **kwargs):
+    """
+    POST through the shared session, retrying throttled and failed requests.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to `max_retries`
+    times with jittered exponential backoff, waiting for Retry-After when the server sends
+    it. `is_throttled(response)` lets callers flag rate limits that an API reports inside a
+    successful response. The last response (or exception) is returned (or raised) once
+    retries are exhausted.
+
+    A request holds a `limiter` slot until its body has been read: with stream=True that
+    is when the caller closes the response, so streamed requests count against the limit
+    for as long as they are downloading.
+    """
+    session = get_http_session()
+    for attempt in range(max_retries + 1):
+        try:
+            if limiter:
+                limiter.acquire()
+            try:
+                response = session.post(url, **kwargs)
+            except BaseException:
+                if limiter:
+                    limiter.release()
+                raise
+            if limiter:
+                if kwargs.get("stream"):
+                    _release_on_close(response, limiter)
+                else:
+                    limiter.release()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            throttled = response.status_code == 429 or bool(is_throttled and response.ok and is_throttled(response))
+            if not throttled and response.status_code not in RETRYABLE_STATUS_CODES:
+                if limiter:
+                    limiter.on_success()
+                return response
+            if throttled and limiter:
+                limiter.on_throttle()
+            if attempt == max_retries:
+                return response
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            response.close()
+        current_span().add("retries")
+        logger.info("Retrying POST %s in %.1fs (attempt %d/%d)", url.split("?")[0], delay, attempt + 1, max_retries)
+        time.sleep(delay)
+
+
+def iter_sse_data(response):
+    """Yield the decoded JSON payload of every `data:` line in a streamed server-sent events response."""
+    if response.encoding is None:
+        response.encoding = "utf-8"
+    # Audio events are tens of KB of hex on one line; iter_lines re-splits its whole pending
+    # buffer on every chunk, so the default 512-byte chunks make long lines quadratic
+    for line in response.iter_lines(chunk_size=SSE_READ_CHUNK_SIZE, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        yield json.loads(data)
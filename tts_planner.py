@@ -0,0 +1,87 @@
+"""Plan TTS requests for a dialogue: merge short same-voice runs and split long lines at sentence ends."""
+import math
+import re
+from collections import namedtuple
+
+_SENTENCE_END = re.compile(r"(?<=[。！？；…!?;])|(?<=[.])(?=\s)")
+_CLAUSE_END = re.compile(r"(?<=[，、,:：])")
+
+# One Minimax request. `unit_id` is the first line of the audio unit it belongs to: a unit is
+# either several consecutive same-voice lines merged into one request, or one long line split
+# into `parts` requests whose audio is joined back together in `part` order.
+TtsRequest = namedtuple("TtsRequest", "request_id unit_id line_numbers text voice_id part parts")
+
+
+def _split_at(pattern, text):
+    return [piece for piece in pattern.split(text) if piece.strip()]
+
+
+def split_long_text(text, max_chars):
+    """
+    Split `text` into roughly equal parts of at most `max_chars` characters.
+
+    Parts break after sentence-ending punctuation where possible, then after commas,
+    and only cut mid-clause for a single clause longer than `max_chars`.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces = []
+    for sentence in _split_at(_SENTENCE_END, text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _split_at(_CLAUSE_END, sentence):
+            # Cut an unpunctuated run into equal slices rather than full ones plus a short tail
+            size = math.ceil(len(clause) / math.ceil(len(clause) / max_chars))
+            pieces.extend(clause[start:start + size] for start in range(0, len(clause), size))
+
+    # Aim for evenly sized parts, so no single request is much slower than the rest
+    target = len(text) / math.ceil(len(text) / max_chars)
+    parts = []
+    current = ""
+    for piece in pieces:
+        if current and (len(current) + len(piece) > max_chars or len(current) >= target):
+            parts.append(current)
+            current = ""
+        current += piece
+    if current:
+        parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def plan_tts_requests(lines, max_chars):
+    """
+    Turn (line_number, text, voice_id) tuples into TtsRequests.
+
+    Consecutive lines with the same voice are merged into one request while the combined
+    text stays within `max_chars`; a line longer than `max_chars` is split into several
+    requests. `lines` is consumed lazily and requests are yielded in dialogue order, at
+    most one line behind the input, so a streamed script can still be synthesized as it
+    is written.
+    """
+    group = []
+
+    def flush():
+        line_numbers = tuple(line_number for line_number, _, _ in group)
+        text = "\n".join(text for _, text, _ in group)
+        return TtsRequest(str(line_numbers[0]), line_numbers[0], line_numbers, text, group[0][2], 0, 1)
+
+    for line_number, text, voice_id in lines:
+        text = text.strip()
+        if group and (
+            voice_id != group[0][2] or sum(len(t) + 1 for _, t, _ in group) + len(text) > max_chars
+        ):
+            yield flush()
+            group = []
+        if len(text) <= max_chars:
+            group.append((line_number, text, voice_id))
+            continue
+
+        parts = split_long_text(text, max_chars)
+        for part, part_text in enumerate(parts):
+            yield TtsRequest(
+                f"{line_number}.part{part + 1}", line_number, (line_number,), part_text, voice_id, part, len(parts)
+            )
+    if group:
+        yield flush()